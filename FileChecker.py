@@ -1,21 +1,1029 @@
+import os
+import sys
 import re
 import json
+import time
+import queue
+import threading
+import itertools
+import heapq
+import tempfile
+import fnmatch
+import unicodedata
+import hashlib
+import mmap
+import zlib
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
+from collections import OrderedDict
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# 预定义的常用模式
+PREDEFINED_PATTERNS = {
+    '[年份4位]': r'(\d{4})',
+    '[数字]': r'(\d+)',
+    '[日期8位]': r'(\d{8})',
+    '[任意字符]': r'(.*)',
+    '[字母]': r'([a-zA-Z]+)',
+    '[汉字]': r'([\u4e00-\u9fff]+)'
+}
+
+def analyze_required_literals(regex_source: str) -> Tuple[str, str, List[str]]:
+    """分析正则中必然出现的字面量，返回 (必要前缀, 必要后缀, 中间必要子串)"""
+    parsed = sre_parse.parse(regex_source)
+    # 带有全局标志（如忽略大小写、多行）时字面量不再可靠，放弃预过滤
+    if parsed.state.flags & ~sre_parse.SRE_FLAG_UNICODE:
+        return '', '', []
+    # 展开顶层序列：不带局部标志的分组必然出现，可以直接展开
+    nodes = []
+    pending = list(parsed)
+    while pending:
+        op, av = pending.pop(0)
+        if op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+            pending[0:0] = list(av[3])
+        else:
+            nodes.append((op, av))
+    # 按非字面量节点切分出连续的字面量段，锚点等零宽断言不打断字面量段
+    runs = []
+    current = []
+    starts_with_literal = True
+    for op, av in nodes:
+        if op is sre_parse.LITERAL:
+            current.append(chr(av))
+        elif op is sre_parse.AT:
+            continue
+        else:
+            if current:
+                runs.append((''.join(current), starts_with_literal))
+                current = []
+            starts_with_literal = False
+    ends_with_literal = bool(current)
+    if current:
+        runs.append((''.join(current), starts_with_literal))
+    if not runs:
+        return '', '', []
+    prefix = runs[0][0] if runs[0][1] else ''
+    suffix = runs[-1][0] if ends_with_literal else ''
+    # 前缀、后缀单独检查，剩余的段作为必要子串
+    middle = runs[1 if prefix else 0:len(runs) - 1 if suffix else len(runs)]
+    substrings = [run for run, _ in middle if run]
+    return prefix, suffix, substrings
+
+# 判断两个重复能否匹配相同字符时使用的探测字符
+OVERLAP_PROBE_CHARS = ''.join(chr(code) for code in range(32, 127)) + '\té　一年０Ａ'
+PROBE_ALL = frozenset(OVERLAP_PROBE_CHARS)
+
+# 字符类中的类别对应的正则
+CATEGORY_REGEXES = {
+    sre_parse.CATEGORY_DIGIT: re.compile(r'\d'),
+    sre_parse.CATEGORY_NOT_DIGIT: re.compile(r'\D'),
+    sre_parse.CATEGORY_SPACE: re.compile(r'\s'),
+    sre_parse.CATEGORY_NOT_SPACE: re.compile(r'\S'),
+    sre_parse.CATEGORY_WORD: re.compile(r'\w'),
+    sre_parse.CATEGORY_NOT_WORD: re.compile(r'\W')
+}
+
+REPEAT_OPS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+def char_matches(op, av, char: str) -> bool:
+    """单字符节点能否匹配给定字符，无法判断的节点按能匹配处理"""
+    if op is sre_parse.LITERAL:
+        return char == chr(av)
+    if op is sre_parse.NOT_LITERAL:
+        return char != chr(av)
+    if op is sre_parse.IN:
+        negate = False
+        found = False
+        for item_op, item_av in av:
+            if item_op is sre_parse.NEGATE:
+                negate = True
+            elif item_op is sre_parse.LITERAL:
+                found = found or char == chr(item_av)
+            elif item_op is sre_parse.RANGE:
+                found = found or item_av[0] <= ord(char) <= item_av[1]
+            elif item_op is sre_parse.CATEGORY and item_av in CATEGORY_REGEXES:
+                found = found or bool(CATEGORY_REGEXES[item_av].match(char))
+            else:
+                found = True
+        return found != negate
+    return True
+
+def flatten_nodes(items) -> list:
+    """展开分组，返回顺序出现的节点（分组对匹配方式没有影响）"""
+    nodes = []
+    for op, av in items:
+        if op is sre_parse.SUBPATTERN:
+            nodes.extend(flatten_nodes(av[3]))
+        else:
+            nodes.append((op, av))
+    return nodes
+
+def probe_char_set(items) -> frozenset:
+    """节点序列可以匹配的探测字符，不是单个字符时按可匹配任意字符处理"""
+    nodes = flatten_nodes(items)
+    if len(nodes) != 1:
+        return PROBE_ALL
+    op, av = nodes[0]
+    if op in REPEAT_OPS:
+        return probe_char_set(av[2])
+    return frozenset(char for char in OVERLAP_PROBE_CHARS if char_matches(op, av, char))
+
+def has_unbounded_repeat(items) -> bool:
+    """节点序列中是否含有无上限的重复"""
+    for op, av in items:
+        if op in REPEAT_OPS:
+            if av[1] == sre_parse.MAXREPEAT or has_unbounded_repeat(av[2]):
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            if has_unbounded_repeat(av[3]):
+                return True
+        elif op is sre_parse.BRANCH:
+            if any(has_unbounded_repeat(branch) for branch in av[1]):
+                return True
+    return False
+
+def is_ambiguous_repeat_body(body) -> bool:
+    """外层重复的内容能否以多种方式切分同一段字符（如 (a+)+、(.*_)+）
+
+    内层无上限重复之间的必需内容如果都能被这些重复匹配，各次重复的边界就不唯一；
+    必需内容中有重复匹配不了的字符（如 (\\d+_)+ 中的 '_'）时边界是确定的
+    """
+    if not has_unbounded_repeat(body):
+        return False
+    nodes = [(op, av) for op, av in flatten_nodes(body) if op is not sre_parse.AT]
+    repeat_chars = frozenset()
+    separators = []
+    for op, av in nodes:
+        if op in REPEAT_OPS and av[1] == sre_parse.MAXREPEAT:
+            repeat_chars |= probe_char_set(av[2])
+        elif op in REPEAT_OPS and av[0] == 0:
+            continue
+        else:
+            separators.append(probe_char_set([(op, av)]))
+    if not repeat_chars:
+        # 无上限的重复藏在分支或更深的重复里，无法简单判断，按有风险处理
+        return True
+    return all(chars & repeat_chars for chars in separators)
+
+def can_match_empty(items) -> bool:
+    """节点序列能否匹配空串（只含锚点和可省略的重复）"""
+    for op, av in flatten_nodes(items):
+        if op is sre_parse.AT:
+            continue
+        if op in REPEAT_OPS and av[0] == 0:
+            continue
+        if op is sre_parse.BRANCH and any(can_match_empty(branch) for branch in av[1]):
+            continue
+        return False
+    return True
+
+def first_char_set(items) -> frozenset:
+    """节点序列匹配的第一个字符可能是哪些探测字符（无法判断时按任意字符处理）"""
+    for op, av in flatten_nodes(items):
+        if op is sre_parse.AT:
+            continue
+        if op in REPEAT_OPS:
+            return probe_char_set(av[2]) if av[0] > 0 else PROBE_ALL
+        if op is sre_parse.BRANCH:
+            return PROBE_ALL
+        return probe_char_set([(op, av)])
+    return PROBE_ALL
+
+def has_ambiguous_branch(body) -> bool:
+    """重复的内容中是否有分支可以匹配相同的内容（如 (a|aa)+、(a|ab)*）
+
+    解析时分支的公共前缀会被提取出来，(a|aa) 变为 a(|a)，因此一个分支是另一个的前缀时表现为分支可以匹配空串；
+    其余情况按各分支的第一个字符是否可能相同判断
+    """
+    for op, av in flatten_nodes(body):
+        if op is not sre_parse.BRANCH:
+            continue
+        branches = av[1]
+        if any(can_match_empty(branch) for branch in branches):
+            return True
+        first_chars = [first_char_set(branch) for branch in branches]
+        for index, chars in enumerate(first_chars):
+            if any(chars & other for other in first_chars[index + 1:]):
+                return True
+    return False
+
+# 一串无上限重复之间的分隔字符也能被这些重复匹配时，匹配失败的尝试次数约为 长度^重复个数，达到该个数即视为有风险
+BACKTRACKING_CHAIN_LIMIT = 3
+
+def collect_backtracking_risks(items, risks: List[str]):
+    """递归检查节点序列中的嵌套重复、相邻重复和可互相让出字符的一串重复"""
+    nodes = flatten_nodes(items)
+    previous = None  # 上一个无上限重复可以匹配的字符（中间只隔着锚点或可省略的内容）
+    chain_chars = frozenset()  # 当前这串重复可以匹配的字符
+    chain_length = 0  # 当前这串重复的个数，中间的分隔内容都可能被这些重复匹配
+    for index, (op, av) in enumerate(nodes):
+        separator = None  # 必需的分隔内容可以匹配的字符
+        if op in REPEAT_OPS:
+            low, high, body = av
+            if high > 1 and is_ambiguous_repeat_body(body):
+                risks.append("嵌套的重复（如 (a+)+），名称不符合时尝试次数随长度指数增长")
+            elif high > 1 and has_ambiguous_branch(body):
+                risks.append("重复的分支可以匹配相同的内容（如 (a|aa)+），名称不符合时尝试次数随长度指数增长")
+            collect_backtracking_risks(body, risks)
+            if high == sre_parse.MAXREPEAT:
+                chars = probe_char_set(body)
+                # 末尾的 .* 总能匹配剩余部分，不会引起回溯
+                at_end = chars == PROBE_ALL and all(rest_op is sre_parse.AT for rest_op, _ in nodes[index + 1:])
+                if not at_end:
+                    if previous is not None and previous & chars:
+                        risks.append("相邻的重复可以匹配相同的字符（如 .*.*），名称不符合时尝试次数成倍增长")
+                    if chain_length and chain_chars & chars:
+                        chain_length += 1
+                        chain_chars |= chars
+                    else:
+                        chain_length = 1
+                        chain_chars = chars
+                    if chain_length == BACKTRACKING_CHAIN_LIMIT:
+                        risks.append("多个重复之间的分隔字符也能被这些重复匹配（如 .*_.*_.*x），名称不符合时尝试次数随长度的多次方增长")
+                previous = chars
+            elif low > 0:
+                previous = None
+                separator = probe_char_set(body)
+        elif op is sre_parse.AT:
+            continue
+        else:
+            if op is sre_parse.BRANCH:
+                for branch in av[1]:
+                    collect_backtracking_risks(branch, risks)
+            elif op is sre_parse.ATOMIC_GROUP:
+                collect_backtracking_risks(av, risks)
+            elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+                collect_backtracking_risks(av[1], risks)
+            previous = None
+            separator = probe_char_set([(op, av)])
+        # 分隔内容不可能被前面的重复匹配时，各重复的边界是确定的，这串重复到此为止
+        if separator is not None and not separator & chain_chars:
+            chain_length = 0
+            chain_chars = frozenset()
+
+def find_backtracking_risks(regex_source: str) -> List[str]:
+    """静态分析正则中可能引起灾难性回溯的写法，返回问题说明（没有风险时为空列表）"""
+    try:
+        parsed = sre_parse.parse(regex_source)
+    except re.error:
+        return []
+    risks = []
+    collect_backtracking_risks(list(parsed), risks)
+    return list(dict.fromkeys(risks))
+
+# 可匹配任意字符的写法（用户模式中的 [任意字符] 和正则的 .*、.+）
+ANY_CHAR_TOKEN = r'(?:\[任意字符\]|(?<!\\)\(\.[*+]\)|(?<!\\)\.[*+])'
+
+def suggest_safe_pattern(pattern: str) -> str:
+    """给出与命名模式等价、避免回溯风险的写法（无法改写的部分保持不变）"""
+    def merge_any_chars(match) -> str:
+        tokens = re.findall(ANY_CHAR_TOKEN, match.group(0))
+        # 每个 .+ 至少匹配一个字符，合并后用 .{n,} 保留最短长度
+        required = sum(1 for token in tokens if '+' in token)
+        if required == 0:
+            return '[任意字符]' if '[任意字符]' in tokens else '.*'
+        return '.+' if required == 1 else f'.{{{required},}}'
+    # 连续的任意字符合并为一个：[任意字符][任意字符] -> [任意字符]，.*.+ -> .+
+    rewritten = re.sub(f'{ANY_CHAR_TOKEN}{{2,}}', merge_any_chars, pattern)
+    # 嵌套的单字符重复展开：(a+)+ -> a+，(a*)+、(a+)*、(a*)* -> a*
+    def unnest(match) -> str:
+        atom, inner, outer = match.groups()
+        return atom + ('+' if inner == outer == '+' else '*')
+    rewritten = re.sub(r'\((\\.|[^\\()\[\]|*+?{}])([*+])\)([*+])', unnest, rewritten)
+    return rewritten
+
+# 符号链接遍历策略 {策略: 显示名称}
+SYMLINK_POLICIES = {
+    'none': '不跟随',
+    'within_root': '仅跟随根目录内',
+    'follow': '跟随（防循环）'
+}
+
+# 操作系统生成的元数据文件/文件夹，开启"跳过隐藏/系统文件"时忽略
+SYSTEM_ENTRY_NAMES = {
+    '.DS_Store', '._.DS_Store', '.Spotlight-V100', '.Trashes', '.fseventsd', '__MACOSX',
+    'Thumbs.db', 'ehthumbs.db', 'desktop.ini', '$RECYCLE.BIN', 'System Volume Information',
+    '@eaDir', '#recycle', '#snapshot'
+}
+
+# Windows 隐藏/系统文件属性
+WINDOWS_HIDDEN_ATTRIBUTES = 0x2 | 0x4  # FILE_ATTRIBUTE_HIDDEN | FILE_ATTRIBUTE_SYSTEM
+
+# 结果区域最多显示的已解决基线问题数
+RESOLVED_DISPLAY_LIMIT = 1000
+
+class SymlinkLoopError(OSError):
+    """符号链接指向了当前遍历路径上的上级目录"""
+
+class TreeSnapshot:
+    """
+    上次扫描的目录树模型 - 只保存各文件夹下的子文件夹名和文件名，
+    规则或列表修改后可直接据此复查，无需重新遍历磁盘
+    """
+    def __init__(self, root: str, symlink_policy: str, skip_hidden: bool):
+        self.root = root
+        self.symlink_policy = symlink_policy
+        self.skip_hidden = skip_hidden
+        self.scanned_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        # {相对路径('.' 为根目录): [子文件夹名列表, 文件名列表] 或 {'error': 类型, 'message': 信息}}
+        self.dirs = {}
+
+    def matches(self, root: str, symlink_policy: str, skip_hidden: bool) -> bool:
+        """判断快照是否适用于本次检查（根目录和遍历选项相同）"""
+        return (self.root, self.symlink_policy, self.skip_hidden) == (root, symlink_policy, skip_hidden)
+
+    def record(self, rel_path: str, folder_names: List[str], file_names: List[str]):
+        """记录一个文件夹的列表"""
+        self.dirs[rel_path] = [folder_names, file_names]
+
+    def record_error(self, rel_path: str, error: Exception):
+        """记录列出文件夹时发生的错误，复查时原样重现"""
+        if rel_path in self.dirs:
+            return
+        if isinstance(error, SymlinkLoopError):
+            kind = 'loop'
+        elif isinstance(error, PermissionError):
+            kind = 'permission'
+        else:
+            kind = 'error'
+        self.dirs[rel_path] = {'error': kind, 'message': str(error)}
+
+    def forget(self, rel_path: str, recursive: bool = True):
+        """删除文件夹（默认连同其下所有文件夹）的记录，下次检查时重新读取磁盘"""
+        if rel_path == '.' and recursive:
+            self.dirs.clear()
+            return
+        self.dirs.pop(rel_path, None)
+        if recursive:
+            prefix = rel_path + '/'
+            for key in [key for key in self.dirs if key.startswith(prefix)]:
+                del self.dirs[key]
+
+    def listing(self, rel_path: str) -> Tuple[List[str], List[str]]:
+        """返回文件夹的子文件夹名和文件名，记录过错误时重新抛出"""
+        entry = self.dirs[rel_path]
+        if isinstance(entry, dict):
+            if entry['error'] == 'loop':
+                raise SymlinkLoopError(entry['message'])
+            if entry['error'] == 'permission':
+                raise PermissionError(entry['message'])
+            raise OSError(entry['message'])
+        return entry[0], entry[1]
+
+    def save(self, file_path: str):
+        """保存到磁盘"""
+        snapshot_data = {
+            'root': self.root,
+            'symlink_policy': self.symlink_policy,
+            'skip_hidden': self.skip_hidden,
+            'scanned_at': self.scanned_at,
+            'dirs': self.dirs
+        }
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot_data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, file_path: str) -> 'TreeSnapshot':
+        """从磁盘读取"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            snapshot_data = json.load(f)
+        snapshot = cls(snapshot_data['root'], snapshot_data['symlink_policy'], snapshot_data['skip_hidden'])
+        snapshot.scanned_at = snapshot_data.get('scanned_at', '')
+        snapshot.dirs = snapshot_data['dirs']
+        return snapshot
+
+# 规则对话框实时预览：抽样名称上限、抽样时最多访问的文件夹数、防抖延迟和结果轮询间隔（毫秒）
+PREVIEW_SAMPLE_LIMIT = 200
+PREVIEW_MAX_DIRS = 2000
+PREVIEW_DEBOUNCE_MS = 300
+PREVIEW_POLL_MS = 100
+
+# 逐块处理目录项时每块的条目数，超大的扁平目录也只占用有限内存
+DIRECTORY_CHUNK_SIZE = 2000
+# 子文件夹名称溢出到临时文件的有序段数上限，达到后先把这些段合并为一段，打开的临时文件数也有限
+NAME_SPILL_FAN_IN = 64
+
+class SortedNameQueue:
+    """按名称排序的子文件夹队列
+
+    名称每攒满 DIRECTORY_CHUNK_SIZE 个就排序后写入临时文件（每行一个 JSON 字符串），
+    遍历时把各有序段归并输出，超大的扁平目录排序时也只占用有限内存
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.runs = []
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, name: str):
+        self.buffer.append(name)
+        self.count += 1
+        if len(self.buffer) >= DIRECTORY_CHUNK_SIZE:
+            self.buffer.sort()
+            self.runs.append(self.write_run(self.buffer))
+            self.buffer = []
+            if len(self.runs) >= NAME_SPILL_FAN_IN:
+                runs = self.runs
+                self.runs = [self.write_run(heapq.merge(*(self.read_run(run) for run in runs)))]
+                for run in runs:
+                    run.close()
+
+    @staticmethod
+    def write_run(names):
+        run = tempfile.TemporaryFile('w+', encoding='utf-8')
+        for name in names:
+            # ensure_ascii 保留无法解码的文件名中的代理字符
+            run.write(json.dumps(name))
+            run.write('\n')
+        run.seek(0)
+        return run
+
+    @staticmethod
+    def read_run(run):
+        run.seek(0)
+        for line in run:
+            yield json.loads(line)
+
+    def __iter__(self):
+        self.buffer.sort()
+        if not self.runs:
+            return iter(self.buffer)
+        return heapq.merge(self.buffer, *(self.read_run(run) for run in self.runs))
+
+    def close(self):
+        for run in self.runs:
+            run.close()
+        self.runs = []
+        self.buffer = []
+
+# 重复内容检测：先按大小分组，再比较文件开头和末尾各一块的哈希，仍相同的才读取完整内容
+CONTENT_HASH_BLOCK_SIZE = 64 * 1024
+CONTENT_HASH_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+
+SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+
+def parse_size(text: str) -> Optional[int]:
+    """把 500KB、1.5GB 这样的文本转换为字节数，留空返回 None"""
+    text = text.strip().upper().replace(' ', '')
+    if not text:
+        return None
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([KMGT]?B?)', text)
+    if not match:
+        raise ValueError(text)
+    unit = match.group(2) or 'B'
+    if not unit.endswith('B'):
+        unit += 'B'
+    return int(float(match.group(1)) * SIZE_UNITS[unit])
+
+def format_size(size: int) -> str:
+    """把字节数格式化为便于阅读的文本"""
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            break
+        size /= 1024
+    return f"{size} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+
+def hash_file_blocks(path: str, size: int) -> bytes:
+    """文件开头和末尾各一块内容的哈希；文件不超过两块时即为完整内容的哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        if size <= 2 * CONTENT_HASH_BLOCK_SIZE:
+            digest.update(f.read())
+        else:
+            digest.update(f.read(CONTENT_HASH_BLOCK_SIZE))
+            f.seek(size - CONTENT_HASH_BLOCK_SIZE)
+            digest.update(f.read(CONTENT_HASH_BLOCK_SIZE))
+    return digest.digest()
+
+def hash_file_contents(path: str, size: int) -> bytes:
+    """完整内容的哈希，通过内存映射读取"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        if size == 0:
+            return digest.digest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest.update(mapped)
+    return digest.digest()
+
+# 分片检查部分结果文件的格式标识
+SHARD_FILE_FORMAT = 'FileChecker-shard'
+SHARD_FILE_VERSION = 2
+
+# 名称匹配结果缓存的默认容量（条目数）
+MATCH_CACHE_SIZE = 100000
+
+class MatchCache:
+    """
+    有界 LRU 缓存 - 以 (已编译模式, 名称) 为键，保存匹配结果和提取的列表值
+    """
+    def __init__(self, maxsize: int = MATCH_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """查找缓存，未命中时返回 None"""
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def resize(self, maxsize: int):
+        """调整缓存容量"""
+        self.maxsize = maxsize
+        while len(self._entries) > max(maxsize, 0):
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存条目（保留命中统计）"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """返回缓存统计信息"""
+        return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+# 全角转半角的范围
+NAME_FOLDING_MODES = {
+    'none': '不转换',
+    'alnum': '数字、字母和下划线',
+    'ascii': '所有全角ASCII字符'
+}
+
+def build_width_fold_table(mode: str) -> Optional[Dict[int, str]]:
+    """生成全角转半角的 str.translate 转换表，不转换时返回 None"""
+    if mode not in NAME_FOLDING_MODES or mode == 'none':
+        return None
+    table = {}
+    # 全角 ASCII 字符 U+FF01~U+FF5E 与半角字符相差 0xFEE0
+    for code in range(0xFF01, 0xFF5F):
+        char = chr(code - 0xFEE0)
+        if mode == 'ascii' or char.isalnum() or char == '_':
+            table[code] = char
+    if mode == 'ascii':
+        table[0x3000] = ' '  # 全角空格
+    return table
+
+WIDTH_FOLD_TABLES = {mode: build_width_fold_table(mode) for mode in NAME_FOLDING_MODES}
+
+class NameNormalizer:
+    """
+    名称规范化 - Unicode NFC 合成和全角转半角，每个不同的名称只计算一次
+    """
+    def __init__(self, nfc: bool = False, width_folding: str = 'none', cache_size: int = MATCH_CACHE_SIZE):
+        self.nfc = nfc
+        self.width_folding = width_folding
+        self.table = WIDTH_FOLD_TABLES.get(width_folding)
+        self.enabled = nfc or self.table is not None
+        self.cache = MatchCache(cache_size)
+
+    def normalize_uncached(self, text: str) -> str:
+        """规范化文本（不使用缓存），纯 ASCII 文本保持不变"""
+        if text.isascii():
+            return text
+        if self.nfc and not unicodedata.is_normalized('NFC', text):
+            text = unicodedata.normalize('NFC', text)
+        if self.table is not None:
+            text = text.translate(self.table)
+        return text
+
+    def normalize(self, name: str) -> str:
+        """规范化名称，结果按名称缓存"""
+        if not self.enabled or name.isascii():
+            return name
+        normalized = self.cache.get(name)
+        if normalized is None:
+            normalized = self.normalize_uncached(name)
+            self.cache.put(name, normalized)
+        return normalized
+
+    def normalize_many(self, names: List[str]) -> List[str]:
+        """批量规范化名称，未启用时原样返回"""
+        if not self.enabled:
+            return names
+        normalize = self.normalize
+        return [normalize(name) for name in names]
+
+class CompiledPattern:
+    """
+    编译后的命名模式 - 先用必要的字面量前缀/后缀/子串快速排除，再执行正则匹配
+    """
+    __slots__ = ('pattern', 'regex', 'prefix', 'suffix', 'suffix_nl', 'substrings', 'list_items', 'risks', 'cacheable')
+
+    def __init__(self, pattern: str, regex, list_items: List[Tuple[str, List[str]]]):
+        self.pattern = pattern
+        self.regex = regex
+        self.prefix, self.suffix, self.substrings = analyze_required_literals(regex.pattern)
+        # '$' 也能匹配末尾换行符之前的位置，后缀检查需要兼容这种情况
+        self.suffix_nl = self.suffix + '\n'
+        self.list_items = list_items
+        # 有回溯风险的模式在检查时放到子进程中限时匹配
+        self.risks = find_backtracking_risks(regex.pattern)
+        # 只缓存有回溯风险或无法用字面量预先排除的模式的匹配结果，其余模式直接匹配比查缓存更快
+        self.cacheable = bool(self.risks) or not (self.prefix or self.suffix or self.substrings)
+
+    def match(self, name: str) -> Tuple[bool, Dict[str, str]]:
+        """检查名称是否符合模式，返回匹配结果和提取的列表值"""
+        if self.prefix and not name.startswith(self.prefix):
+            return False, {}
+        if self.suffix and not name.endswith(self.suffix) and not name.endswith(self.suffix_nl):
+            return False, {}
+        for substring in self.substrings:
+            if substring not in name:
+                return False, {}
+        if not self.regex.match(name):
+            return False, {}
+        return True, self.extract(name)
+
+    def match_many(self, names: List[str]) -> Tuple[bytearray, Dict[int, Dict[str, str]]]:
+        """批量匹配，返回通过标记向量（1 通过 / 0 不通过）和通过名称的列表值 {索引: 列表值}"""
+        passed = bytearray(len(names))
+        extracted = {}
+        prefix, suffix, suffix_nl, substrings = self.prefix, self.suffix, self.suffix_nl, self.substrings
+        regex_match = self.regex.match
+        extract = self.extract
+        for index, name in enumerate(names):
+            if prefix and not name.startswith(prefix):
+                continue
+            if suffix and not name.endswith(suffix) and not name.endswith(suffix_nl):
+                continue
+            if substrings and not all(substring in name for substring in substrings):
+                continue
+            if regex_match(name):
+                passed[index] = 1
+                extracted[index] = extract(name)
+        return passed, extracted
+
+    def extract(self, name: str) -> Dict[str, str]:
+        """从已匹配的名称中提取列表值（与 extract_list_values 规则一致）"""
+        list_values = {}
+        for list_name, sorted_items in self.list_items:
+            for item in sorted_items:
+                if item in name:
+                    list_values[list_name] = item
+                    break
+        return list_values
+
+# 合并正则中各规则分支的组名前缀
+RULE_BRANCH_PREFIX = '_rule'
+
+def level_rules(rules: Dict[int, object], level: int) -> List[dict]:
+    """返回某层的规则列表（兼容旧版本每层只有一条规则的字典格式）"""
+    level_rule_list = rules.get(level)
+    if not level_rule_list:
+        return []
+    if isinstance(level_rule_list, dict):
+        return [level_rule_list]
+    return level_rule_list
+
+def parse_preset(preset_data: dict) -> Tuple[Dict[str, List[str]], Dict[int, List[dict]], Dict[int, List[dict]], List[dict]]:
+    """校验预设内容并转换为内部格式，返回 (自定义列表, 文件夹规则, 文件规则, 约束规则)；格式有误时抛出 ValueError"""
+    if not isinstance(preset_data, dict):
+        raise ValueError("预设内容必须是 JSON 对象")
+    custom_lists = preset_data.get('custom_lists', {})
+    if not isinstance(custom_lists, dict) or not all(isinstance(items, list) for items in custom_lists.values()):
+        raise ValueError("custom_lists 必须是 {列表名: [列表项, ...]}")
+    naming_rules = []
+    for rules_key in ('folder_rules', 'file_rules'):
+        rules = preset_data.get(rules_key, {})
+        if not isinstance(rules, dict):
+            raise ValueError(f"{rules_key} 必须是 {{层级: [规则, ...]}}")
+        converted = {}
+        for level, rule_list in rules.items():
+            try:
+                level = int(level)
+            except ValueError:
+                raise ValueError(f"{rules_key} 的层级必须是数字：{level!r}") from None
+            # 旧版本预设每层只有一条规则，统一转换为规则列表
+            rule_list = rule_list if isinstance(rule_list, list) else [rule_list]
+            for rule in rule_list:
+                if not isinstance(rule, dict) or not isinstance(rule.get('pattern'), str):
+                    raise ValueError(f"{rules_key} 第 {level + 1} 层的规则缺少命名模式 pattern")
+                if rules_key == 'file_rules' and not isinstance(rule.get('extensions'), list):
+                    raise ValueError(f"file_rules 第 {level + 1} 层的规则缺少扩展名列表 extensions")
+            converted[level] = rule_list
+        naming_rules.append(converted)
+    constraint_rules = preset_data.get('constraint_rules', [])
+    if not isinstance(constraint_rules, list):
+        raise ValueError("constraint_rules 必须是规则列表")
+    for rule in constraint_rules:
+        rule_type = rule.get('type') if isinstance(rule, dict) else None
+        if rule_type not in ('unique', 'coverage', 'size', 'duplicate'):
+            raise ValueError(f"未知的约束规则类型：{rule_type!r}")
+        targets = ('folder', 'file') if rule_type in ('unique', 'coverage') else ('file',)
+        if rule.get('target') not in targets:
+            raise ValueError(f"{rule_type} 规则的检查对象 target 必须是 {' 或 '.join(targets)}")
+        for field in ('level', 'scope_level', 'min_size', 'max_size'):
+            value = rule.get(field)
+            # bool 是 int 的子类，需要单独排除
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 0):
+                raise ValueError(f"{rule_type} 规则的 {field} 必须是非负整数或 null：{value!r}")
+        if not isinstance(rule.get('key', ''), str):
+            raise ValueError(f"{rule_type} 规则的列表名 key 必须是字符串")
+        if rule_type == 'coverage' and (not rule.get('key') or rule.get('level') is None):
+            raise ValueError("覆盖规则缺少列表名 key 或层级 level")
+    return custom_lists, naming_rules[0], naming_rules[1], constraint_rules
+
+def parse_scope_values(text: str) -> Dict[str, str]:
+    """解析“列表名=值”形式的上级列表值条件，多个条件用逗号分隔"""
+    scope_values = {}
+    for part in re.split(r'[,，]', text):
+        part = part.strip()
+        if not part:
+            continue
+        list_name, sep, value = part.partition('=')
+        if not sep or not list_name.strip() or not value.strip():
+            raise ValueError(part)
+        scope_values[list_name.strip()] = value.strip()
+    return scope_values
+
+def format_scope_values(scope_values: Dict[str, str]) -> str:
+    """把上级列表值条件格式化为“列表名=值”文本"""
+    return ', '.join(f"{list_name}={value}" for list_name, value in scope_values.items())
+
+def scope_segments(scope: str) -> List[str]:
+    """把作用范围（相对检查根目录的路径通配符）拆成路径段"""
+    return [segment for segment in scope.replace('\\', '/').split('/') if segment not in ('', '.')]
+
+class ScopeTrie:
+    """
+    规则作用范围的前缀树 - 以路径段为键，查找某个文件夹适用的规则时只沿其路径走一遍，与规则数量无关
+    """
+    __slots__ = ('children', 'wildcards', 'any_depth', 'repeat', 'items')
+
+    def __init__(self, repeat: bool = False):
+        self.children = {}     # 字面量路径段 -> 子节点
+        self.wildcards = []    # [(含通配符的路径段, 子节点)]
+        self.any_depth = None  # '**' 对应的子节点
+        self.repeat = repeat   # 是否为 '**' 节点（可以再匹配任意多个路径段）
+        self.items = []        # 作用范围到此为止的规则序号
+
+    def insert(self, scope: str, item: int):
+        """登记一条规则的作用范围"""
+        node = self
+        for segment in scope_segments(scope):
+            if segment == '**':
+                if node.any_depth is None:
+                    node.any_depth = ScopeTrie(repeat=True)
+                node = node.any_depth
+            elif any(char in segment for char in '*?['):
+                for pattern, child in node.wildcards:
+                    if pattern == segment:
+                        node = child
+                        break
+                else:
+                    child = ScopeTrie()
+                    node.wildcards.append((segment, child))
+                    node = child
+            else:
+                node = node.children.setdefault(segment, ScopeTrie())
+        node.items.append(item)
+
+    @staticmethod
+    def expand(nodes: List['ScopeTrie']) -> List['ScopeTrie']:
+        """加入 '**' 匹配零个路径段时到达的节点"""
+        expanded = []
+        seen = set()
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            expanded.append(node)
+            if node.any_depth is not None:
+                stack.append(node.any_depth)
+        return expanded
+
+    def lookup(self, segments: List[str]) -> List[int]:
+        """返回作用范围包含该路径的规则序号（升序）"""
+        active = self.expand([self])
+        for segment in segments:
+            next_nodes = []
+            for node in active:
+                child = node.children.get(segment)
+                if child is not None:
+                    next_nodes.append(child)
+                for pattern, child in node.wildcards:
+                    if fnmatch.fnmatchcase(segment, pattern):
+                        next_nodes.append(child)
+                if node.repeat:
+                    next_nodes.append(node)
+            if not next_nodes:
+                return []
+            active = self.expand(next_nodes)
+        items = set()
+        for node in active:
+            items.update(node.items)
+        return sorted(items)
+
+class RuleMatcher:
+    """
+    同一层的多条命名模式 - 合并为一个带命名分支的正则，一次匹配即可得知名称符合哪条规则
+    """
+    def __init__(self, compiled_patterns: List[Optional[CompiledPattern]]):
+        # 无效的模式（None）不参与匹配
+        self.compiled_patterns = compiled_patterns
+        self.valid = [(position, compiled) for position, compiled in enumerate(compiled_patterns) if compiled is not None]
+        self.regex = None
+        self.risky = any(compiled.risks for _, compiled in self.valid)
+        self.cacheable = any(compiled.cacheable for _, compiled in self.valid)
+        if len(self.valid) > 1:
+            sources = [compiled.regex.pattern for _, compiled in self.valid]
+            # 含反向引用、条件分组引用或同名分组的模式合并后组号会错位，这时退回逐条匹配
+            if not any(re.search(r'\\[1-9]|\(\?P[<=]|\(\?\(', source) for source in sources):
+                branches = [f'(?P<{RULE_BRANCH_PREFIX}{position}>{compiled.regex.pattern})' for position, compiled in self.valid]
+                try:
+                    self.regex = re.compile('|'.join(branches))
+                except re.error:
+                    self.regex = None
+
+    def classify(self, name: str) -> Tuple[int, Dict[str, str]]:
+        """返回名称符合的第一条规则的序号（都不符合时为 -1）和提取的列表值"""
+        if self.regex is None:
+            for position, compiled in self.valid:
+                is_match, list_values = compiled.match(name)
+                if is_match:
+                    return position, list_values
+            return -1, {}
+        match = self.regex.match(name)
+        if not match:
+            return -1, {}
+        position = int(match.lastgroup[len(RULE_BRANCH_PREFIX):])
+        return position, self.compiled_patterns[position].extract(name)
+
+    def classify_many(self, names: List[str]) -> Tuple[List[int], Dict[int, Dict[str, str]]]:
+        """批量匹配，返回每个名称符合的规则序号（-1 表示都不符合）和匹配名称的列表值 {索引: 列表值}"""
+        if len(self.valid) == 1:
+            # 只有一条规则时直接用它的字面量快速排除
+            position, compiled = self.valid[0]
+            passed, extracted = compiled.match_many(names)
+            return [position if flag else -1 for flag in passed], extracted
+        positions = [-1] * len(names)
+        extracted = {}
+        classify = self.classify
+        for index, name in enumerate(names):
+            position, list_values = classify(name)
+            if position >= 0:
+                positions[index] = position
+                extracted[index] = list_values
+        return positions, extracted
+
+# 有回溯风险的模式匹配单个名称的时限（秒）
+MATCH_TIME_LIMIT = 2.0
+
+# 匹配超时的名称在规则序号列表中的标记
+MATCH_TIMEOUT = -2
+
+def guarded_match_worker(conn):
+    """限时匹配的子进程：接收 (模式列表, 名称列表)，逐个发回名称符合的第一条模式序号（都不符合时为 -1）"""
+    while True:
+        try:
+            sources, names = conn.recv()
+        except EOFError:
+            return
+        regexes = [(position, re.compile(source, flags)) for position, source, flags in sources]
+        for name in names:
+            result = -1
+            for position, regex in regexes:
+                if regex.match(name):
+                    result = position
+                    break
+            conn.send(result)
+
+class MatchGuard:
+    """
+    限时匹配 - re 的匹配无法中途打断，有回溯风险的模式放到子进程中匹配，超时后结束子进程并重新启动
+    """
+    def __init__(self):
+        self.process = None
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def connection(self):
+        """返回与子进程的连接，子进程未启动或已结束时重新启动"""
+        if self.process is None or not self.process.is_alive():
+            self.close()
+            parent_conn, child_conn = multiprocessing.Pipe()
+            self.process = multiprocessing.Process(target=guarded_match_worker, args=(child_conn,), daemon=True)
+            self.process.start()
+            child_conn.close()
+            self.conn = parent_conn
+        return self.conn
+
+    def close(self):
+        """结束子进程"""
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def classify_many(self, matcher: RuleMatcher, names: List[str], time_limit: float) -> Tuple[List[int], Dict[int, Dict[str, str]]]:
+        """与 RuleMatcher.classify_many 相同，但单个名称超过时限时序号记为 MATCH_TIMEOUT 并继续匹配后面的名称"""
+        positions = [-1] * len(names)
+        extracted = {}
+        sources = [(position, compiled.regex.pattern, compiled.regex.flags) for position, compiled in matcher.valid]
+        index = 0
+        with self.lock:
+            while index < len(names):
+                conn = self.connection()
+                conn.send((sources, names[index:]))
+                while index < len(names):
+                    if not conn.poll(time_limit):
+                        # 子进程卡在这个名称上，结束它，剩余的名称交给新的子进程
+                        self.close()
+                        positions[index] = MATCH_TIMEOUT
+                        index += 1
+                        break
+                    position = conn.recv()
+                    if position >= 0:
+                        positions[index] = position
+                        extracted[index] = matcher.compiled_patterns[position].extract(names[index])
+                    index += 1
+        return positions, extracted
 
 class FileStructureChecker:
     """
     文件结构检查工具 - 带GUI规则设定和列表匹配功能
+
+    gui 为 False 时不创建界面，供命令行（分片检查、合并结果）使用
     """
-    def __init__(self):
+    def __init__(self, gui: bool = True):
         self.root_folder = Path(".").resolve()
         self.custom_lists = {}  # 用户自定义列表
-        self.folder_rules = {}  # 文件夹规则 {internal_level (0-based): rule_dict}
-        self.file_rules = {}    # 文件规则 {internal_level (0-based): rule_dict}
+        self.folder_rules = {}  # 文件夹规则 {internal_level (0-based): [rule_dict, ...]}，按顺序匹配
+        self.file_rules = {}    # 文件规则 {internal_level (0-based): [rule_dict, ...]}，按顺序匹配
+        self._folder_rule_rows = []  # 文件夹规则列表框每行对应的 (内部层级, 同层序号)
+        self._file_rule_rows = []    # 文件规则列表框每行对应的 (内部层级, 同层序号)
+        self.constraint_rules = []  # 约束规则（唯一性、覆盖、文件大小、重复内容规则），作用于整个目录树
         self.results = []       # 检查结果
-        self.setup_gui()
+        self._compiled_patterns = {}  # 已编译的命名模式 {pattern: CompiledPattern 或 None}
+        self._rule_matchers = {}      # 同层多条规则的合并匹配器 {(pattern, ...): RuleMatcher}
+        self._scope_tries = {}        # 本次检查中带作用范围的规则 {(规则类型, 内部层级): ScopeTrie}
+        self.match_cache = MatchCache()  # 名称匹配结果缓存 {(CompiledPattern, name): (is_match, list_values)}
+        self.name_normalizer = NameNormalizer()  # 名称规范化（NFC、全角转半角），默认不启用
+        self.match_guard = MatchGuard()  # 有回溯风险的模式在子进程中限时匹配
+        self.match_time_limit = MATCH_TIME_LIMIT  # 有回溯风险的模式匹配单个名称的时限（秒）
+        self.symlink_policy = 'follow'  # 符号链接遍历策略，见 SYMLINK_POLICIES
+        self.skip_hidden = False  # 是否跳过隐藏/系统文件
+        self._check_root = None   # 本次检查的根目录
+        self._walk_root = None    # 本次遍历的根目录（已解析）
+        self._active_dirs = set() # 当前遍历路径上的 (device, inode)，用于检测循环
+        self.cache_tree = False       # 是否缓存扫描到的目录树（缓存保留所有名称，默认关闭以限制内存）
+        self.tree_snapshot = None     # 上次扫描的目录树 (TreeSnapshot)
+        self.last_check_from_cache = False  # 上次检查是否使用了缓存的目录树
+        self._record_snapshot = None  # 本次遍历正在记录的目录树
+        self._replay_snapshot = None  # 本次检查所复用的目录树
+        self.baseline_keys = set()    # 基线中的已知问题 {(type, 相对路径, 规则)}
+        self.baseline_file = None     # 已加载的基线文件路径
+        self.suppressed_count = 0     # 本次检查中被基线忽略的问题数
+        self._baseline_seen = set()   # 本次检查中出现过的基线问题
+        self._unique_rules = {'folder': [], 'file': []}  # 本次检查启用的唯一性规则 {对象: [(规则序号, rule_dict)]}
+        self._unique_index = {}       # 唯一性索引 {(规则序号, 范围, 键值): (路径, 层级) 或 [(路径, 层级), ...]}
+        self._coverage_rules = {}     # 本次检查启用的覆盖规则 {所在文件夹的遍历层级: [(规则序号, rule_dict, {列表项: 位}), ...]}
+        self._size_rules = []         # 本次检查启用的文件大小规则 [(规则序号, rule_dict)]
+        self._duplicate_rules = []    # 本次检查启用的重复内容规则 [(规则序号, rule_dict)]
+        self._duplicate_candidates = {}  # 重复内容候选 {规则序号: {文件大小: [(路径, 层级), ...]}}
+        self._shard = None            # 分片检查参数 {'index', 'count', 'level'}，非分片检查时为 None
+        self._shard_owner = True      # 当前位置的问题是否由本分片报告
+        self._order_path = None       # 分片检查时当前文件夹在全量遍历中的位置
+        self._order_prefix = []       # 分片检查时当前问题排序键的前缀
+        self._order_counter = None    # 分片检查时问题的产生序号
+        self.preset_name = '当前规则'  # 同时检查多个预设时，本检查器规则产生的问题标注的预设名称
+        self.preset_checkers = OrderedDict()  # 同时检查的其它预设 {预设名称: FileStructureChecker}
+        self._size_cache = None       # 同时检查多个预设时共用的文件大小 {路径: 字节数}
+        if gui:
+            self.setup_gui()
 
     def setup_gui(self):
         """设置图形界面"""
@@ -129,7 +1137,9 @@ class FileStructureChecker:
         edit_folder_btn = ttk.Button(folder_btn_frame, text="编辑规则", command=self.edit_folder_rule)
         edit_folder_btn.pack(side=tk.LEFT, padx=(0, 5))
         del_folder_btn = ttk.Button(folder_btn_frame, text="删除规则", command=self.delete_folder_rule)
-        del_folder_btn.pack(side=tk.LEFT)
+        del_folder_btn.pack(side=tk.LEFT, padx=(0, 5))
+        up_folder_btn = ttk.Button(folder_btn_frame, text="上移", command=self.move_folder_rule_up)
+        up_folder_btn.pack(side=tk.LEFT)
         # 文件夹规则列表
         self.folder_rules_listbox = tk.Listbox(folder_rules_frame, height=6)
         self.folder_rules_listbox.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -149,24 +1159,55 @@ class FileStructureChecker:
         edit_file_btn = ttk.Button(file_btn_frame, text="编辑规则", command=self.edit_file_rule)
         edit_file_btn.pack(side=tk.LEFT, padx=(0, 5))
         del_file_btn = ttk.Button(file_btn_frame, text="删除规则", command=self.delete_file_rule)
-        del_file_btn.pack(side=tk.LEFT)
+        del_file_btn.pack(side=tk.LEFT, padx=(0, 5))
+        up_file_btn = ttk.Button(file_btn_frame, text="上移", command=self.move_file_rule_up)
+        up_file_btn.pack(side=tk.LEFT)
         # 文件规则列表
         self.file_rules_listbox = tk.Listbox(file_rules_frame, height=6)
         self.file_rules_listbox.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         file_rules_scrollbar = ttk.Scrollbar(file_rules_frame, orient="vertical", command=self.file_rules_listbox.yview)
         file_rules_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
         self.file_rules_listbox.configure(yscrollcommand=file_rules_scrollbar.set)
-        # 预设管理 - 移动到这里，放在文件规则下方
+        # 约束规则设定（作用于整个目录树，如唯一性规则、覆盖规则、内容规则）
+        constraint_rules_frame = ttk.LabelFrame(right_frame, text="约束规则", padding="10")
+        constraint_rules_frame.grid(row=4, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        constraint_rules_frame.columnconfigure(0, weight=1)
+        constraint_rules_frame.rowconfigure(1, weight=1)
+        constraint_btn_frame = ttk.Frame(constraint_rules_frame)
+        constraint_btn_frame.grid(row=0, column=0, sticky=tk.W, pady=(0, 10))
+        add_unique_btn = ttk.Button(constraint_btn_frame, text="添加唯一性规则", command=self.add_unique_rule)
+        add_unique_btn.pack(side=tk.LEFT, padx=(0, 5))
+        add_coverage_btn = ttk.Button(constraint_btn_frame, text="添加覆盖规则", command=self.add_coverage_rule)
+        add_coverage_btn.pack(side=tk.LEFT, padx=(0, 5))
+        add_size_btn = ttk.Button(constraint_btn_frame, text="添加大小规则", command=self.add_size_rule)
+        add_size_btn.pack(side=tk.LEFT, padx=(0, 5))
+        add_duplicate_btn = ttk.Button(constraint_btn_frame, text="添加重复内容规则", command=self.add_duplicate_rule)
+        add_duplicate_btn.pack(side=tk.LEFT, padx=(0, 5))
+        del_constraint_btn = ttk.Button(constraint_btn_frame, text="删除规则", command=self.delete_constraint_rule)
+        del_constraint_btn.pack(side=tk.LEFT)
+        self.constraint_rules_listbox = tk.Listbox(constraint_rules_frame, height=4)
+        self.constraint_rules_listbox.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        constraint_rules_scrollbar = ttk.Scrollbar(constraint_rules_frame, orient="vertical", command=self.constraint_rules_listbox.yview)
+        constraint_rules_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.constraint_rules_listbox.configure(yscrollcommand=constraint_rules_scrollbar.set)
+        # 预设管理 - 移动到这里，放在约束规则下方
         # 创建一个新的 Frame 来放置预设按钮，避免遮挡
         preset_frame = ttk.Frame(right_frame) # 新建 Frame
-        preset_frame.grid(row=4, column=0, sticky=tk.W, pady=(0, 10)) # 原来是 row=2，现在是 row=4
+        preset_frame.grid(row=5, column=0, sticky=tk.W, pady=(0, 10))
         save_preset_btn = ttk.Button(preset_frame, text="保存预设", command=self.save_preset)
         save_preset_btn.pack(side=tk.LEFT, padx=(0, 10))
         load_preset_btn = ttk.Button(preset_frame, text="加载预设", command=self.load_preset)
-        load_preset_btn.pack(side=tk.LEFT)
+        load_preset_btn.pack(side=tk.LEFT, padx=(0, 10))
+        # 同时检查的其它预设：一次遍历，按各自的规则检查，问题标注所属预设
+        add_extra_preset_btn = ttk.Button(preset_frame, text="同时检查预设...", command=self.add_extra_preset)
+        add_extra_preset_btn.pack(side=tk.LEFT, padx=(0, 10))
+        clear_extra_presets_btn = ttk.Button(preset_frame, text="清除同时检查的预设", command=self.clear_extra_presets)
+        clear_extra_presets_btn.pack(side=tk.LEFT, padx=(0, 10))
+        self.extra_presets_var = tk.StringVar(value="")
+        ttk.Label(preset_frame, textvariable=self.extra_presets_var).pack(side=tk.LEFT)
         # 常用模式说明 - 减小 pady 为 (10, 0) -> (5, 0)，减小内部 help_text_widget 高度
         help_frame = ttk.LabelFrame(right_frame, text="常用模式说明", padding="5")
-        help_frame.grid(row=5, column=0, sticky=(tk.W, tk.E), pady=(5, 0)) # 修改了 pady
+        help_frame.grid(row=6, column=0, sticky=(tk.W, tk.E), pady=(5, 0)) # 修改了 pady
         help_frame.columnconfigure(0, weight=1)
         # 更新 help_text，移除层级说明
         help_text = """
@@ -175,6 +1216,7 @@ class FileStructureChecker:
         [年份4位] - 4位年份    [数字] - 数字    [日期8位] - 8位日期
         [任意字符] - 任意字符    [字母] - 字母    [汉字] - 汉字
         [列表名] - 使用自定义列表中的值
+        开启名称规范化（执行检查页）后，模式中请使用半角数字和字母
         """ # 移除了层级说明部分
         help_label = ttk.Label(help_frame, text=help_text)
         help_label.grid(row=0, column=0, sticky=tk.W)
@@ -193,6 +1235,41 @@ class FileStructureChecker:
         self.check_btn.grid(row=0, column=0, padx=(0, 10))
         self.save_btn = ttk.Button(button_frame, text="保存结果", command=self.save_results, state=tk.DISABLED)
         self.save_btn.grid(row=0, column=1, padx=(0, 10))
+        # 基线管理
+        self.export_baseline_btn = ttk.Button(button_frame, text="导出基线", command=self.export_baseline, state=tk.DISABLED)
+        self.export_baseline_btn.grid(row=0, column=5, padx=(10, 10))
+        load_baseline_btn = ttk.Button(button_frame, text="加载基线", command=self.load_baseline)
+        load_baseline_btn.grid(row=0, column=6, padx=(0, 10))
+        clear_baseline_btn = ttk.Button(button_frame, text="清除基线", command=self.clear_baseline)
+        clear_baseline_btn.grid(row=0, column=7)
+        # 目录树缓存
+        self.cache_tree_var = tk.BooleanVar(value=self.cache_tree)
+        cache_tree_check = ttk.Checkbutton(button_frame, text="缓存目录树（修改规则后无需重新扫描）", variable=self.cache_tree_var)
+        cache_tree_check.grid(row=1, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        rescan_btn = ttk.Button(button_frame, text="重新扫描磁盘", command=lambda: self.run_check_gui(rescan=True))
+        rescan_btn.grid(row=1, column=3, columnspan=2, pady=(10, 0))
+        save_tree_btn = ttk.Button(button_frame, text="保存目录树", command=self.save_tree_snapshot)
+        save_tree_btn.grid(row=1, column=5, pady=(10, 0))
+        load_tree_btn = ttk.Button(button_frame, text="加载目录树", command=self.load_tree_snapshot)
+        load_tree_btn.grid(row=1, column=6, pady=(10, 0))
+        # 遍历选项
+        self.skip_hidden_var = tk.BooleanVar(value=self.skip_hidden)
+        skip_hidden_check = ttk.Checkbutton(button_frame, text="跳过隐藏/系统文件", variable=self.skip_hidden_var)
+        skip_hidden_check.grid(row=0, column=2, padx=(0, 10))
+        ttk.Label(button_frame, text="符号链接:").grid(row=0, column=3)
+        self.symlink_policy_var = tk.StringVar(value=SYMLINK_POLICIES[self.symlink_policy])
+        symlink_combo = ttk.Combobox(button_frame, textvariable=self.symlink_policy_var, values=list(SYMLINK_POLICIES.values()), state="readonly", width=14)
+        symlink_combo.grid(row=0, column=4, padx=(5, 0))
+        # 名称规范化（修改后立即生效，规则对话框中的预览也按此匹配）
+        self.normalize_nfc_var = tk.BooleanVar(value=self.name_normalizer.nfc)
+        normalize_nfc_check = ttk.Checkbutton(button_frame, text="统一Unicode编码(NFC)", variable=self.normalize_nfc_var,
+                                              command=self.apply_name_normalization)
+        normalize_nfc_check.grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(10, 0))
+        ttk.Label(button_frame, text="全角转半角:").grid(row=2, column=2, sticky=tk.E, pady=(10, 0))
+        self.width_folding_var = tk.StringVar(value=NAME_FOLDING_MODES[self.name_normalizer.width_folding])
+        width_folding_combo = ttk.Combobox(button_frame, textvariable=self.width_folding_var, values=list(NAME_FOLDING_MODES.values()), state="readonly", width=16)
+        width_folding_combo.grid(row=2, column=3, columnspan=2, sticky=tk.W, padx=(5, 0), pady=(10, 0))
+        width_folding_combo.bind("<<ComboboxSelected>>", self.apply_name_normalization)
         # 结果显示
         result_frame = ttk.LabelFrame(check_frame, text="检查结果", padding="10")
         result_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -214,6 +1291,7 @@ class FileStructureChecker:
             messagebox.showerror("错误", f"列表 '{list_name}' 已存在！")
             return
         self.custom_lists[list_name] = []
+        self.invalidate_rule_caches()
         self.list_name_var.set("")
         self.update_lists_display()
 
@@ -227,6 +1305,7 @@ class FileStructureChecker:
         if messagebox.askyesno("确认", f"确定要删除列表 '{list_name}' 吗？"):
             if list_name in self.custom_lists:
                 del self.custom_lists[list_name]
+                self.invalidate_rule_caches()
                 self.update_lists_display()
                 self.list_items_listbox.delete(0, tk.END)
 
@@ -245,6 +1324,7 @@ class FileStructureChecker:
             messagebox.showerror("错误", f"列表项 '{item_value}' 已存在！")
             return
         self.custom_lists[list_name].append(item_value)
+        self.invalidate_rule_caches()
         self.list_item_var.set("")
         self.update_list_items_display(list_name)
 
@@ -263,6 +1343,7 @@ class FileStructureChecker:
                 if list_name in self.custom_lists and item_value in self.custom_lists[list_name]:
                     if messagebox.askyesno("确认", f"确定要删除列表项 '{item_value}' 吗？"):
                         self.custom_lists[list_name].remove(item_value)
+                        self.invalidate_rule_caches()
                         # 实时更新显示
                         self.update_list_items_display(list_name)
                         deleted = True
@@ -272,6 +1353,7 @@ class FileStructureChecker:
                     if item_value in self.custom_lists[list_name]:
                         if messagebox.askyesno("确认", f"确定要删除列表项 '{item_value}' 吗？"):
                             self.custom_lists[list_name].remove(item_value)
+                            self.invalidate_rule_caches()
                             # 实时更新显示
                             self.update_list_items_display(list_name)
                             deleted = True
@@ -305,92 +1387,96 @@ class FileStructureChecker:
             self.update_list_items_display(list_name)
 
     # 规则编辑功能
+    def selected_rule_row(self, listbox, rule_rows: List[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+        """返回列表框中选中规则的 (内部层级, 同层序号)，未选中时返回 None"""
+        selection = listbox.curselection()
+        if not selection or selection[0] >= len(rule_rows):
+            return None
+        return rule_rows[selection[0]]
+
+    def replace_level_rule(self, rules: Dict[int, list], internal_level: int, position: int,
+                           new_internal_level: int, new_rule: dict):
+        """用编辑后的规则替换原规则；层级改变时移到新层级的末尾"""
+        if new_internal_level == internal_level:
+            rules[internal_level][position] = new_rule
+            return
+        self.remove_level_rule(rules, internal_level, position)
+        rules.setdefault(new_internal_level, []).append(new_rule)
+
+    def remove_level_rule(self, rules: Dict[int, list], internal_level: int, position: int):
+        """删除某层的一条规则，该层没有规则时删除层级"""
+        del rules[internal_level][position]
+        if not rules[internal_level]:
+            del rules[internal_level]
+
     def edit_folder_rule(self):
         """编辑文件夹规则"""
-        selection = self.folder_rules_listbox.curselection()
-        if not selection:
+        row = self.selected_rule_row(self.folder_rules_listbox, self._folder_rule_rows)
+        if row is None:
             messagebox.showwarning("警告", "请先选择要编辑的规则！")
             return
-        # 从显示列表中获取层级
-        selected_text = self.folder_rules_listbox.get(selection[0])
-        try:
-            user_level = int(selected_text.split(':')[0].split()[1])
-            internal_level = user_level - 1  # 转换为内部层级
-            # 获取现有规则
-            if internal_level in self.folder_rules:
-                existing_rule = self.folder_rules[internal_level]
-                # 打开编辑对话框
-                dialog = EditRuleDialog(
-                    self.root, 
-                    "编辑文件夹规则", 
-                    "folder", 
-                    list(self.custom_lists.keys()),
-                    internal_level + 1,  # 转换回用户层级
-                    existing_rule
-                )
-                self.root.wait_window(dialog.dialog)
-                if dialog.result:
-                    # 更新规则
-                    new_level = dialog.result['level']
-                    new_internal_level = new_level - 1  # 转换为内部层级
-                    # 如果层级改变了，需要删除旧规则
-                    if new_internal_level != internal_level:
-                        del self.folder_rules[internal_level]
-                    self.folder_rules[new_internal_level] = {
-                        'pattern': dialog.result['pattern'],
-                        'description': dialog.result['description'],
-                        'list_matching': dialog.result.get('list_matching', {})
-                    }
-                    # 更新显示
-                    self.update_folder_rules_list()
-            else:
-                messagebox.showerror("错误", "找不到对应的规则！")
-        except Exception as e:
-            messagebox.showerror("错误", f"解析规则信息失败：{str(e)}")
+        internal_level, position = row
+        existing_rule = self.folder_rules[internal_level][position]
+        # 打开编辑对话框
+        dialog = EditRuleDialog(
+            self.root, 
+            "编辑文件夹规则", 
+            "folder", 
+            list(self.custom_lists.keys()),
+            internal_level + 1,  # 转换回用户层级
+            existing_rule,
+            checker=self
+        )
+        self.root.wait_window(dialog.dialog)
+        if dialog.result:
+            # 更新规则
+            new_level = dialog.result['level']
+            new_internal_level = new_level - 1  # 转换为内部层级
+            self.replace_level_rule(self.folder_rules, internal_level, position, new_internal_level, {
+                'pattern': dialog.result['pattern'],
+                'description': dialog.result['description'],
+                'list_matching': dialog.result.get('list_matching', {}),
+                'scope': dialog.result.get('scope', ''),
+                'scope_values': dialog.result.get('scope_values', {})
+            })
+            self.invalidate_rule_caches()
+            # 更新显示
+            self.update_folder_rules_list()
 
     def edit_file_rule(self):
         """编辑文件规则"""
-        selection = self.file_rules_listbox.curselection()
-        if not selection:
+        row = self.selected_rule_row(self.file_rules_listbox, self._file_rule_rows)
+        if row is None:
             messagebox.showwarning("警告", "请先选择要编辑的规则！")
             return
-        # 从显示列表中获取层级
-        selected_text = self.file_rules_listbox.get(selection[0])
-        try:
-            user_level = int(selected_text.split(':')[0].split()[1])
-            internal_level = user_level - 1  # 转换为内部层级
-            # 获取现有规则
-            if internal_level in self.file_rules:
-                existing_rule = self.file_rules[internal_level]
-                # 打开编辑对话框
-                dialog = EditRuleDialog(
-                    self.root, 
-                    "编辑文件规则", 
-                    "file", 
-                    list(self.custom_lists.keys()),
-                    internal_level + 1,  # 转换回用户层级
-                    existing_rule
-                )
-                self.root.wait_window(dialog.dialog)
-                if dialog.result:
-                    # 更新规则
-                    new_level = dialog.result['level']
-                    new_internal_level = new_level - 1  # 转换为内部层级
-                    # 如果层级改变了，需要删除旧规则
-                    if new_internal_level != internal_level:
-                        del self.file_rules[internal_level]
-                    self.file_rules[new_internal_level] = {
-                        'pattern': dialog.result['pattern'],
-                        'extensions': dialog.result['extensions'],
-                        'description': dialog.result['description'],
-                        'list_matching': dialog.result.get('list_matching', {})
-                    }
-                    # 更新显示
-                    self.update_file_rules_list()
-            else:
-                messagebox.showerror("错误", "找不到对应的规则！")
-        except Exception as e:
-            messagebox.showerror("错误", f"解析规则信息失败：{str(e)}")
+        internal_level, position = row
+        existing_rule = self.file_rules[internal_level][position]
+        # 打开编辑对话框
+        dialog = EditRuleDialog(
+            self.root, 
+            "编辑文件规则", 
+            "file", 
+            list(self.custom_lists.keys()),
+            internal_level + 1,  # 转换回用户层级
+            existing_rule,
+            checker=self
+        )
+        self.root.wait_window(dialog.dialog)
+        if dialog.result:
+            # 更新规则
+            new_level = dialog.result['level']
+            new_internal_level = new_level - 1  # 转换为内部层级
+            self.replace_level_rule(self.file_rules, internal_level, position, new_internal_level, {
+                'pattern': dialog.result['pattern'],
+                'extensions': dialog.result['extensions'],
+                'description': dialog.result['description'],
+                'list_matching': dialog.result.get('list_matching', {}),
+                'scope': dialog.result.get('scope', ''),
+                'scope_values': dialog.result.get('scope_values', {})
+            })
+            self.invalidate_rule_caches()
+            # 更新显示
+            self.update_file_rules_list()
 
     # 其他原有方法保持不变...
     def browse_folder(self):
@@ -401,8 +1487,8 @@ class FileStructureChecker:
             self.root_folder = Path(folder_path)
 
     def add_folder_rule(self):
-        """添加文件夹规则"""
-        dialog = RuleDialog(self.root, "添加文件夹规则", "folder", list(self.custom_lists.keys()))
+        """添加文件夹规则（同层已有规则时追加到末尾）"""
+        dialog = RuleDialog(self.root, "添加文件夹规则", "folder", list(self.custom_lists.keys()), checker=self)
         self.root.wait_window(dialog.dialog)
         if dialog.result:
             level = dialog.result['level']
@@ -411,17 +1497,20 @@ class FileStructureChecker:
             list_matching = dialog.result.get('list_matching', {})
             # 转换层级：用户输入的1对应内部的0
             internal_level = level - 1
-            self.folder_rules[internal_level] = {
+            self.folder_rules.setdefault(internal_level, []).append({
                 'pattern': pattern,
                 'description': description,
-                'list_matching': list_matching
-            }
+                'list_matching': list_matching,
+                'scope': dialog.result.get('scope', ''),
+                'scope_values': dialog.result.get('scope_values', {})
+            })
+            self.invalidate_rule_caches()
             # 更新列表显示
             self.update_folder_rules_list()
 
     def add_file_rule(self):
-        """添加文件规则"""
-        dialog = RuleDialog(self.root, "添加文件规则", "file", list(self.custom_lists.keys()))
+        """添加文件规则（同层已有规则时追加到末尾）"""
+        dialog = RuleDialog(self.root, "添加文件规则", "file", list(self.custom_lists.keys()), checker=self)
         self.root.wait_window(dialog.dialog)
         if dialog.result:
             level = dialog.result['level']
@@ -431,86 +1520,189 @@ class FileStructureChecker:
             list_matching = dialog.result.get('list_matching', {})
             # 转换层级：用户输入的1对应内部的0
             internal_level = level - 1
-            self.file_rules[internal_level] = {
+            self.file_rules.setdefault(internal_level, []).append({
                 'pattern': pattern,
                 'extensions': extensions,
                 'description': description,
-                'list_matching': list_matching
-            }
+                'list_matching': list_matching,
+                'scope': dialog.result.get('scope', ''),
+                'scope_values': dialog.result.get('scope_values', {})
+            })
+            self.invalidate_rule_caches()
             # 更新列表显示
             self.update_file_rules_list()
 
     def delete_folder_rule(self):
         """删除文件夹规则"""
-        selection = self.folder_rules_listbox.curselection()
-        if not selection:
+        row = self.selected_rule_row(self.folder_rules_listbox, self._folder_rule_rows)
+        if row is None:
             messagebox.showwarning("警告", "请先选择要删除的规则！")
             return
-        # 从显示列表中获取层级
-        selected_text = self.folder_rules_listbox.get(selection[0])
-        # 解析显示文本中的层级（显示的是用户层级，需要转换为内部层级）
-        try:
-            user_level = int(selected_text.split(':')[0].split()[1])
-            internal_level = user_level - 1  # 转换为内部层级
-            # 删除规则
-            if internal_level in self.folder_rules:
-                del self.folder_rules[internal_level]
-                self.update_folder_rules_list()
-            else:
-                messagebox.showerror("错误", "找不到对应的规则！")
-        except Exception as e:
-            messagebox.showerror("错误", f"解析规则层级失败：{str(e)}")
+        self.remove_level_rule(self.folder_rules, *row)
+        self.invalidate_rule_caches()
+        self.update_folder_rules_list()
 
     def delete_file_rule(self):
         """删除文件规则"""
-        selection = self.file_rules_listbox.curselection()
-        if not selection:
+        row = self.selected_rule_row(self.file_rules_listbox, self._file_rule_rows)
+        if row is None:
             messagebox.showwarning("警告", "请先选择要删除的规则！")
             return
-        # 从显示列表中获取层级
-        selected_text = self.file_rules_listbox.get(selection[0])
-        # 解析显示文本中的层级（显示的是用户层级，需要转换为内部层级）
-        try:
-            user_level = int(selected_text.split(':')[0].split()[1])
-            internal_level = user_level - 1  # 转换为内部层级
-            # 删除规则
-            if internal_level in self.file_rules:
-                del self.file_rules[internal_level]
-                self.update_file_rules_list()
-            else:
-                messagebox.showerror("错误", "找不到对应的规则！")
-        except Exception as e:
-            messagebox.showerror("错误", f"解析规则层级失败：{str(e)}")
+        self.remove_level_rule(self.file_rules, *row)
+        self.invalidate_rule_caches()
+        self.update_file_rules_list()
+
+    def move_folder_rule_up(self):
+        """把文件夹规则在同层中上移一位（同层规则按顺序匹配）"""
+        row = self.selected_rule_row(self.folder_rules_listbox, self._folder_rule_rows)
+        if row is None:
+            messagebox.showwarning("警告", "请先选择要移动的规则！")
+            return
+        internal_level, position = row
+        if position == 0:
+            return
+        rules = self.folder_rules[internal_level]
+        rules[position - 1], rules[position] = rules[position], rules[position - 1]
+        self.invalidate_rule_caches()
+        self.update_folder_rules_list()
+        self.folder_rules_listbox.selection_set(self._folder_rule_rows.index((internal_level, position - 1)))
+
+    def move_file_rule_up(self):
+        """把文件规则在同层中上移一位（同层规则按顺序匹配）"""
+        row = self.selected_rule_row(self.file_rules_listbox, self._file_rule_rows)
+        if row is None:
+            messagebox.showwarning("警告", "请先选择要移动的规则！")
+            return
+        internal_level, position = row
+        if position == 0:
+            return
+        rules = self.file_rules[internal_level]
+        rules[position - 1], rules[position] = rules[position], rules[position - 1]
+        self.invalidate_rule_caches()
+        self.update_file_rules_list()
+        self.file_rules_listbox.selection_set(self._file_rule_rows.index((internal_level, position - 1)))
+
+    def describe_rule_scope(self, rule: dict) -> str:
+        """规则作用范围的显示文本，不限范围时为空"""
+        scope_parts = []
+        if rule.get('scope'):
+            scope_parts.append(rule['scope'])
+        if rule.get('scope_values'):
+            scope_parts.append(format_scope_values(rule['scope_values']))
+        return f" [范围: {'; '.join(scope_parts)}]" if scope_parts else ""
 
     def update_folder_rules_list(self):
         """更新文件夹规则列表显示"""
         self.folder_rules_listbox.delete(0, tk.END)
+        self._folder_rule_rows = []
         for level in sorted(self.folder_rules.keys()):
-            rule = self.folder_rules[level]
-            matching_info = ""
-            if rule.get('list_matching'):
-                matching_lists = [f"{k}={v}" for k, v in rule['list_matching'].items()]
-                matching_info = f" [匹配: {', '.join(matching_lists)}]"
-            # 显示时转换回用户理解的层级
-            user_level = level + 1
-            self.folder_rules_listbox.insert(tk.END, f"第 {user_level} 层: {rule['pattern']} - {rule['description']}{matching_info}")
+            rules = level_rules(self.folder_rules, level)
+            for position, rule in enumerate(rules):
+                matching_info = ""
+                if rule.get('list_matching'):
+                    matching_lists = [f"{k}={v}" for k, v in rule['list_matching'].items()]
+                    matching_info = f" [匹配: {', '.join(matching_lists)}]"
+                scope_info = self.describe_rule_scope(rule)
+                # 显示时转换回用户理解的层级，同层有多条规则时标出顺序
+                user_level = level + 1
+                order_info = f" #{position + 1}" if len(rules) > 1 else ""
+                self._folder_rule_rows.append((level, position))
+                self.folder_rules_listbox.insert(tk.END, f"第 {user_level} 层{order_info}: {rule['pattern']} - {rule['description']}{matching_info}{scope_info}")
 
     def update_file_rules_list(self):
         """更新文件规则列表显示"""
         self.file_rules_listbox.delete(0, tk.END)
+        self._file_rule_rows = []
         for level in sorted(self.file_rules.keys()):
-            rule = self.file_rules[level]
-            ext_str = ', '.join(rule['extensions']) if rule['extensions'] else '无限制'
-            matching_info = ""
-            if rule.get('list_matching'):
-                matching_lists = [f"{k}={v}" for k, v in rule['list_matching'].items()]
-                matching_info = f" [匹配: {', '.join(matching_lists)}]"
-            # 显示时转换回用户理解的层级
-            user_level = level + 1
-            self.file_rules_listbox.insert(tk.END, f"第 {user_level} 层: {rule['pattern']} [{ext_str}] - {rule['description']}{matching_info}")
+            rules = level_rules(self.file_rules, level)
+            for position, rule in enumerate(rules):
+                ext_str = ', '.join(rule['extensions']) if rule['extensions'] else '无限制'
+                matching_info = ""
+                if rule.get('list_matching'):
+                    matching_lists = [f"{k}={v}" for k, v in rule['list_matching'].items()]
+                    matching_info = f" [匹配: {', '.join(matching_lists)}]"
+                scope_info = self.describe_rule_scope(rule)
+                # 显示时转换回用户理解的层级，同层有多条规则时标出顺序
+                user_level = level + 1
+                order_info = f" #{position + 1}" if len(rules) > 1 else ""
+                self._file_rule_rows.append((level, position))
+                self.file_rules_listbox.insert(tk.END, f"第 {user_level} 层{order_info}: {rule['pattern']} [{ext_str}] - {rule['description']}{matching_info}{scope_info}")
+
+    def add_unique_rule(self):
+        """添加唯一性规则"""
+        dialog = ConstraintRuleDialog(self.root, "添加唯一性规则", "unique", list(self.custom_lists.keys()))
+        self.root.wait_window(dialog.dialog)
+        if dialog.result:
+            self.constraint_rules.append(dialog.result)
+            self.update_constraint_rules_list()
+
+    def add_size_rule(self):
+        """添加文件大小规则"""
+        dialog = ConstraintRuleDialog(self.root, "添加文件大小规则", "size", list(self.custom_lists.keys()))
+        self.root.wait_window(dialog.dialog)
+        if dialog.result:
+            self.constraint_rules.append(dialog.result)
+            self.update_constraint_rules_list()
+
+    def add_duplicate_rule(self):
+        """添加重复内容规则"""
+        dialog = ConstraintRuleDialog(self.root, "添加重复内容规则", "duplicate", list(self.custom_lists.keys()))
+        self.root.wait_window(dialog.dialog)
+        if dialog.result:
+            self.constraint_rules.append(dialog.result)
+            self.update_constraint_rules_list()
+
+    def add_coverage_rule(self):
+        """添加覆盖规则"""
+        if not self.custom_lists:
+            messagebox.showwarning("警告", "请先创建自定义列表！")
+            return
+        dialog = ConstraintRuleDialog(self.root, "添加覆盖规则", "coverage", list(self.custom_lists.keys()))
+        self.root.wait_window(dialog.dialog)
+        if dialog.result:
+            self.constraint_rules.append(dialog.result)
+            self.update_constraint_rules_list()
+
+    def delete_constraint_rule(self):
+        """删除约束规则"""
+        selection = self.constraint_rules_listbox.curselection()
+        if not selection:
+            messagebox.showwarning("警告", "请先选择要删除的规则！")
+            return
+        del self.constraint_rules[selection[0]]
+        self.update_constraint_rules_list()
+
+    def describe_constraint_rule(self, rule: dict) -> str:
+        """约束规则的简要说明"""
+        target = '文件夹' if rule['target'] == 'folder' else '文件'
+        if rule['type'] == 'coverage':
+            return f"覆盖: [{rule['key']}] 的每一项在每个文件夹下都要有对应的第 {rule['level'] + 1} 层{target}"
+        level = f"第 {rule['level'] + 1} 层" if rule.get('level') is not None else "任意层"
+        if rule['type'] == 'size':
+            bounds = []
+            if rule.get('min_size') is not None:
+                bounds.append(f"不小于 {format_size(rule['min_size'])}")
+            if rule.get('max_size') is not None:
+                bounds.append(f"不超过 {format_size(rule['max_size'])}")
+            return f"大小: {level}文件{'且'.join(bounds)}"
+        if rule['type'] == 'duplicate':
+            return f"重复内容: {level}文件内容不重复（忽略小于 {format_size(rule.get('min_size', 1))} 的文件）"
+        key = f"[{rule['key']}]" if rule.get('key') else "名称"
+        scope = f"每个第 {rule['scope_level'] + 1} 层文件夹内" if rule.get('scope_level') is not None else "整个目录树内"
+        return f"唯一: {level}{target}的{key}在{scope}不重复"
+
+    def update_constraint_rules_list(self):
+        """更新约束规则列表显示"""
+        self.constraint_rules_listbox.delete(0, tk.END)
+        for rule in self.constraint_rules:
+            self.constraint_rules_listbox.insert(tk.END, f"{self.describe_constraint_rule(rule)} - {rule.get('description', '')}")
 
     def extract_list_values(self, name: str, pattern: str) -> Dict[str, str]:
         """从名称中提取列表值"""
+        compiled = self.get_compiled_pattern(pattern)
+        if compiled is not None:
+            # 已编译的模式中保存了规范化并排好序的列表项
+            return compiled.extract(self.name_normalizer.normalize(name))
         list_values = {}
         # 找出模式中包含的所有列表
         list_matches = re.findall(r'\[([^\]]+)\]', pattern)
@@ -526,50 +1718,225 @@ class FileStructureChecker:
                         break
         return list_values
 
-    def check_name_pattern(self, name: str, pattern: str) -> Tuple[bool, Dict[str, str]]:
-        """检查名称是否符合模式，返回匹配结果和提取的列表值"""
+    def compile_name_pattern(self, pattern: str) -> CompiledPattern:
+        """将命名模式编译为正则，并预先分析可用于快速排除的字面量"""
+        # 先处理预定义模式和自定义列表
+        processed_pattern = pattern
+        # 替换预定义模式
+        for placeholder, regex_pattern in PREDEFINED_PATTERNS.items():
+            processed_pattern = processed_pattern.replace(placeholder, regex_pattern)
+        # 找出所有列表占位符
+        list_matches = re.findall(r'\[([^\]]+)\]', processed_pattern)
+        for list_name in list_matches:
+            if list_name in self.custom_lists:
+                # 转义列表项并用|连接（按长度降序排列）
+                sorted_items = self.normalized_list_items(list_name)
+                escaped_items = [re.escape(item) for item in sorted_items]
+                list_pattern = f'({"|".join(escaped_items)})'
+                processed_pattern = processed_pattern.replace(f'[{list_name}]', list_pattern, 1)
+        # 确保整个字符串匹配
+        regex = re.compile(f"^{processed_pattern}$")
+        # 提取列表值时使用原始模式中的列表名（与 extract_list_values 一致）
+        list_items = []
+        for list_name in dict.fromkeys(re.findall(r'\[([^\]]+)\]', pattern)):
+            if list_name in self.custom_lists:
+                list_items.append((list_name, self.normalized_list_items(list_name)))
+        return CompiledPattern(pattern, regex, list_items)
+
+    def normalized_list_items(self, list_name: str) -> List[str]:
+        """规范化后的列表项，按长度降序排列"""
+        normalize = self.name_normalizer.normalize_uncached
+        items = dict.fromkeys(normalize(item) for item in self.custom_lists[list_name])
+        return sorted(items, key=len, reverse=True)
+
+    def set_name_normalization(self, nfc: bool, width_folding: str):
+        """设置名称规范化方式，设置变化时重新编译模式"""
+        normalizer = self.name_normalizer
+        if normalizer.nfc == nfc and normalizer.width_folding == width_folding:
+            return
+        self.name_normalizer = NameNormalizer(nfc, width_folding, normalizer.cache.maxsize)
+        self.invalidate_rule_caches()
+
+    def get_compiled_pattern(self, pattern: str) -> Optional[CompiledPattern]:
+        """获取已编译的命名模式，模式无效时返回 None"""
         try:
-            # 先处理预定义模式和自定义列表
-            processed_pattern = pattern
-            # 预定义的常用模式
-            predefined_patterns = {
-                '[年份4位]': r'(\d{4})',
-                '[数字]': r'(\d+)',
-                '[日期8位]': r'(\d{8})',
-                '[任意字符]': r'(.*)',
-                '[字母]': r'([a-zA-Z]+)',
-                '[汉字]': r'([\u4e00-\u9fff]+)'
-            }
-            # 替换预定义模式
-            for placeholder, regex_pattern in predefined_patterns.items():
-                processed_pattern = processed_pattern.replace(placeholder, regex_pattern)
-            # 处理自定义列表
-            list_values = {}
-            list_placeholders = []
-            # 找出所有列表占位符
-            list_matches = re.findall(r'\[([^\]]+)\]', processed_pattern)
-            for list_name in list_matches:
-                if list_name in self.custom_lists:
-                    list_items = self.custom_lists[list_name]
-                    # 转义列表项并用|连接（按长度降序排列）
-                    sorted_items = sorted(list_items, key=len, reverse=True)
-                    escaped_items = [re.escape(item) for item in sorted_items]
-                    list_pattern = f'({"|".join(escaped_items)})'
-                    processed_pattern = processed_pattern.replace(f'[{list_name}]', list_pattern, 1)
-                    list_placeholders.append(list_name)
-            # 确保整个字符串匹配
-            final_pattern = f"^{processed_pattern}$"
-            # 进行匹配
-            match_result = re.match(final_pattern, name)
-            if match_result:
-                # 提取列表值
-                list_values = self.extract_list_values(name, pattern)
-                return True, list_values
-            else:
-                return False, {}
+            return self._compiled_patterns[pattern]
+        except KeyError:
+            pass
+        try:
+            compiled = self.compile_name_pattern(pattern)
         except Exception as e:
             print(f"模式匹配错误: {e}")
+            compiled = None
+        self._compiled_patterns[pattern] = compiled
+        return compiled
+
+    def analyze_pattern_safety(self, pattern: str) -> Tuple[List[str], Optional[str]]:
+        """检查命名模式的回溯风险，返回问题说明和等价的安全写法（没有时为 None）"""
+        compiled = self.get_compiled_pattern(pattern)
+        if compiled is None or not compiled.risks:
+            return [], None
+        suggestion = suggest_safe_pattern(pattern)
+        if suggestion == pattern:
+            return compiled.risks, None
+        # 改写后仍有风险（或无法编译）时不给出建议
+        try:
+            if self.compile_name_pattern(suggestion).risks:
+                suggestion = None
+        except re.error:
+            suggestion = None
+        return compiled.risks, suggestion
+
+    def invalidate_rule_caches(self):
+        """规则或自定义列表变化后清空已编译的模式和匹配结果缓存"""
+        self._compiled_patterns.clear()
+        self._rule_matchers.clear()
+        self.match_cache.clear()
+
+    def check_name_pattern(self, name: str, pattern: str) -> Tuple[bool, Dict[str, str]]:
+        """检查名称是否符合模式，返回匹配结果和提取的列表值"""
+        compiled = self.get_compiled_pattern(pattern)
+        if compiled is None:
             return False, {}
+        name = self.name_normalizer.normalize(name)
+        if not compiled.cacheable:
+            return compiled.match(name)
+        key = (compiled, name)
+        cached = self.match_cache.get(key)
+        if cached is None:
+            cached = compiled.match(name)
+            self.match_cache.put(key, cached)
+        return cached[0], dict(cached[1])
+
+    def check_names_batch(self, names: List[str], pattern: str) -> Tuple[bytearray, Dict[int, Dict[str, str]]]:
+        """批量检查同一目录下的名称，返回通过标记向量和通过名称的列表值 {索引: 列表值}"""
+        compiled = self.get_compiled_pattern(pattern)
+        if compiled is None:
+            return bytearray(len(names)), {}
+        names = self.name_normalizer.normalize_many(names)
+        cache = self.match_cache
+        if cache.maxsize <= 0 or not compiled.cacheable:
+            return compiled.match_many(names)
+        # 先查缓存，只把未命中的名称交给正则批量匹配，同一批中重复的名称只匹配一次
+        passed = bytearray(len(names))
+        extracted = {}
+        miss_indexes = {}  # 未命中的名称 -> 其在本批中的索引
+        cache_get = cache.get
+        for index, name in enumerate(names):
+            if name in miss_indexes:
+                miss_indexes[name].append(index)
+                continue
+            cached = cache_get((compiled, name))
+            if cached is None:
+                miss_indexes[name] = [index]
+            elif cached[0]:
+                # 返回副本，调用方修改列表值不影响缓存（与 check_name_pattern 一致）
+                passed[index] = 1
+                extracted[index] = dict(cached[1])
+        if miss_indexes:
+            miss_names = list(miss_indexes)
+            miss_passed, miss_values = compiled.match_many(miss_names)
+            cache_put = cache.put
+            for miss_index, name in enumerate(miss_names):
+                if miss_passed[miss_index]:
+                    list_values = miss_values[miss_index]
+                    for index in miss_indexes[name]:
+                        passed[index] = 1
+                        extracted[index] = dict(list_values)
+                    cache_put((compiled, name), (True, dict(list_values)))
+                else:
+                    cache_put((compiled, name), (False, {}))
+        return passed, extracted
+
+    def get_rule_matcher(self, patterns: Tuple[str, ...]) -> RuleMatcher:
+        """获取同层多条命名模式的合并匹配器"""
+        try:
+            return self._rule_matchers[patterns]
+        except KeyError:
+            pass
+        matcher = RuleMatcher([self.get_compiled_pattern(pattern) for pattern in patterns])
+        self._rule_matchers[patterns] = matcher
+        return matcher
+
+    def classify_names_batch(self, names: List[str], patterns: Tuple[str, ...]) -> Tuple[List[int], Dict[int, Dict[str, str]]]:
+        """批量检查名称符合同层的哪条规则，返回规则序号列表（-1 表示都不符合，MATCH_TIMEOUT 表示匹配超时）
+        和匹配名称的列表值 {索引: 列表值}"""
+        matcher = self.get_rule_matcher(patterns)
+        if len(patterns) == 1 and not matcher.risky:
+            passed, extracted = self.check_names_batch(names, patterns[0])
+            return [0 if flag else -1 for flag in passed], extracted
+        names = self.name_normalizer.normalize_many(names)
+        if matcher.risky:
+            classify_many = lambda batch: self.match_guard.classify_many(matcher, batch, self.match_time_limit)
+        else:
+            classify_many = matcher.classify_many
+        cache = self.match_cache
+        if cache.maxsize <= 0 or not matcher.cacheable:
+            return classify_many(names)
+        # 先查缓存，只把未命中的名称交给合并正则批量匹配，同一批中重复的名称只匹配一次
+        positions = [-1] * len(names)
+        extracted = {}
+        miss_indexes = {}  # 未命中的名称 -> 其在本批中的索引
+        cache_get = cache.get
+        for index, name in enumerate(names):
+            if name in miss_indexes:
+                miss_indexes[name].append(index)
+                continue
+            cached = cache_get((matcher, name))
+            if cached is None:
+                miss_indexes[name] = [index]
+            elif cached[0] != -1:
+                positions[index] = cached[0]
+                if cached[0] >= 0:
+                    extracted[index] = dict(cached[1])
+        if miss_indexes:
+            miss_names = list(miss_indexes)
+            miss_positions, miss_values = classify_many(miss_names)
+            cache_put = cache.put
+            for miss_index, name in enumerate(miss_names):
+                position = miss_positions[miss_index]
+                list_values = miss_values.get(miss_index, {}) if position >= 0 else {}
+                for index in miss_indexes[name]:
+                    positions[index] = position
+                    if position >= 0:
+                        extracted[index] = dict(list_values)
+                # 超时的名称也缓存，避免同名的文件再次等待
+                cache_put((matcher, name), (position, dict(list_values)))
+        return positions, extracted
+
+    def build_scope_tries(self) -> Dict[Tuple[str, int], ScopeTrie]:
+        """为含有作用范围的层级建立前缀树，没有作用范围的规则登记为 '**'（适用于所有位置）"""
+        scope_tries = {}
+        for rule_type, rules in (('folder', self.folder_rules), ('file', self.file_rules)):
+            for level in rules:
+                rule_list = level_rules(rules, level)
+                if not any(rule.get('scope') or rule.get('scope_values') for rule in rule_list):
+                    continue
+                trie = ScopeTrie()
+                for position, rule in enumerate(rule_list):
+                    trie.insert(rule.get('scope') or '**', position)
+                scope_tries[(rule_type, level)] = trie
+        return scope_tries
+
+    def rules_in_scope(self, rule_type: str, level: int, dir_path: Path, list_values: Dict[str, str]) -> List[dict]:
+        """返回适用于 dir_path 下文件/子文件夹的规则（按作用范围和上级列表值筛选）"""
+        rules = level_rules(self.folder_rules if rule_type == 'folder' else self.file_rules, level)
+        trie = self._scope_tries.get((rule_type, level))
+        if trie is None:
+            return rules
+        rel_path = self.relative_dir(dir_path)
+        scoped = []
+        for position in trie.lookup([] if rel_path == '.' else rel_path.split('/')):
+            rule = rules[position]
+            scope_values = rule.get('scope_values')
+            if scope_values and any(list_values.get(list_name) != value for list_name, value in scope_values.items()):
+                continue
+            scoped.append(rule)
+        return scoped
+
+    def describe_rules(self, rules: List[dict]) -> str:
+        """同层多条规则的描述，用于命名错误提示"""
+        return '；'.join(rule['description'] for rule in rules)
 
     def check_extension(self, file_path: Path, allowed_extensions: List[str]) -> bool:
         """检查文件扩展名"""
@@ -578,17 +1945,176 @@ class FileStructureChecker:
         file_ext = file_path.suffix.lower()
         return file_ext in [ext.lower() for ext in allowed_extensions]
 
-    def check_recursive(self, current_path: Path, level: int = 0, parent_list_values: Dict[str, str] = None):
-        """递归检查文件夹结构，包含列表匹配检查"""
+    def is_hidden_entry(self, entry: os.DirEntry) -> bool:
+        """判断目录项是否为隐藏文件或操作系统元数据"""
+        name = entry.name
+        if name.startswith('.') or name in SYSTEM_ENTRY_NAMES:
+            return True
+        if os.name == 'nt':
+            # Windows 下目录项的属性随目录列表一起返回，无需额外访问磁盘
+            try:
+                return bool(entry.stat(follow_symlinks=False).st_file_attributes & WINDOWS_HIDDEN_ATTRIBUTES)
+            except OSError:
+                return False
+        return False
+
+    def classify_entry(self, entry: os.DirEntry) -> Optional[str]:
+        """按遍历策略对目录项分类，返回 'folder'、'file' 或 None（忽略）"""
+        if self.skip_hidden and self.is_hidden_entry(entry):
+            return None
+        try:
+            if entry.is_symlink():
+                if self.symlink_policy == 'none':
+                    return None
+                if self.symlink_policy == 'within_root' and self._walk_root is not None:
+                    target = os.path.realpath(entry.path)
+                    try:
+                        if os.path.commonpath([self._walk_root, target]) != self._walk_root:
+                            return None
+                    except ValueError:  # 不在同一个盘符
+                        return None
+            if entry.is_dir():
+                return 'folder'
+            if entry.is_file():
+                return 'file'
+        except OSError:
+            pass
+        return None
+
+    def sample_level_names(self, root_folder: Path, rule_type: str, level: int, limit: int = PREVIEW_SAMPLE_LIMIT) -> List[str]:
+        """抽样指定用户层级的真实名称（文件夹名或文件名），用于规则预览"""
+        names = []
+        # 用户层级 N 的文件夹/文件都位于深度 N-1 的文件夹中
+        parent_depth = level - 1
+        snapshot = self.tree_snapshot
+        if snapshot is not None and snapshot.root == str(root_folder):
+            for rel_path, entry in snapshot.dirs.items():
+                depth = 0 if rel_path == '.' else rel_path.count('/') + 1
+                if depth != parent_depth or isinstance(entry, dict):
+                    continue
+                names.extend(entry[0] if rule_type == "folder" else entry[1])
+                if len(names) >= limit:
+                    break
+            return names[:limit]
+        # 逐层向下展开，访问的文件夹数量有上限
+        frontier = [str(root_folder)]
+        visited = 0
+        for depth in range(parent_depth + 1):
+            next_frontier = []
+            for dir_path in frontier:
+                if visited >= PREVIEW_MAX_DIRS or len(names) >= limit:
+                    break
+                visited += 1
+                try:
+                    with os.scandir(dir_path) as entries:
+                        for entry in entries:
+                            if self.skip_hidden and self.is_hidden_entry(entry):
+                                continue
+                            try:
+                                is_dir = entry.is_dir()
+                            except OSError:
+                                continue
+                            if depth < parent_depth:
+                                if is_dir:
+                                    next_frontier.append(entry.path)
+                            elif is_dir == (rule_type == "folder"):
+                                names.append(entry.name)
+                except OSError:
+                    continue
+            frontier = next_frontier
+        return names[:limit]
+
+    def relative_dir(self, current_path: Path) -> str:
+        """文件夹相对于检查根目录的路径（'/' 分隔，根目录为 '.'）"""
+        return os.path.relpath(current_path, self._check_root).replace(os.sep, '/')
+
+    def enter_directory(self, current_path: Path) -> Optional[Tuple[int, int]]:
+        """进入文件夹前检测符号链接循环，返回加入遍历路径的 (device, inode)"""
+        if self.symlink_policy == 'none' or self.replays_directory(current_path):
+            return None
+        dir_stat = os.stat(current_path)
+        dir_key = (dir_stat.st_dev, dir_stat.st_ino)
+        if dir_key in self._active_dirs:
+            raise SymlinkLoopError(f"文件夹 '{current_path}' 指向其上级目录")
+        self._active_dirs.add(dir_key)
+        return dir_key
+
+    def replays_directory(self, current_path: Path) -> bool:
+        """本次检查是否从缓存的目录树中取得该文件夹的列表"""
+        snapshot = self._replay_snapshot
+        return snapshot is not None and self.relative_dir(current_path) in snapshot.dirs
+
+    def open_directory(self, current_path: Path, file_sizes: Optional[Dict[str, int]] = None):
+        """打开文件夹，返回逐个产生 (名称, 是否为文件夹) 的迭代器
+
+        打开失败（如权限不足）时立即抛出异常；复查时取自缓存的目录树（缓存中没有的文件夹仍读取磁盘），否则边读取磁盘边产生。
+        file_sizes 不为空时，读取磁盘的同时记下文件大小 {文件名: 字节数}
+        """
+        if self.replays_directory(current_path):
+            folder_names, file_names = self._replay_snapshot.listing(self.relative_dir(current_path))
+            return itertools.chain(((name, True) for name in folder_names), ((name, False) for name in file_names))
+        return self.scan_directory(current_path, os.scandir(current_path), file_sizes)
+
+    def scan_directory(self, current_path: Path, entries, file_sizes: Optional[Dict[str, int]] = None):
+        """逐个产生磁盘上的目录项，需要缓存目录树时顺便记录名称"""
+        snapshot = self._record_snapshot
+        folder_names = []
+        file_names = []
+        try:
+            with entries:
+                for entry in entries:
+                    kind = self.classify_entry(entry)
+                    if kind == 'folder':
+                        if snapshot is not None:
+                            folder_names.append(entry.name)
+                        yield entry.name, True
+                    elif kind == 'file':
+                        if snapshot is not None:
+                            file_names.append(entry.name)
+                        if file_sizes is not None:
+                            try:
+                                file_sizes[entry.name] = entry.stat().st_size
+                            except OSError:
+                                pass
+                        yield entry.name, False
+        except OSError as e:
+            if snapshot is not None:
+                snapshot.record_error(self.relative_dir(current_path), e)
+            raise
+        if snapshot is not None:
+            snapshot.record(self.relative_dir(current_path), folder_names, file_names)
+
+    def check_recursive(self, current_path: Path, level: int = 0, parent_list_values: Dict[str, str] = None,
+                        name_match: Optional[Tuple[int, Dict[str, str]]] = None):
+        """递归检查文件夹结构，包含列表匹配检查
+
+        name_match 为上级目录批量检查得到的当前文件夹命名结果（符合的规则序号，-1 表示都不符合），为空时单独检查
+        """
         if parent_list_values is None:
             parent_list_values = {}
+        dir_key = None
+        # 分片检查：分片根目录以上的问题只由 0 号分片报告；记录遍历位置，合并时据此恢复全量检查的问题顺序
+        # 排序键为 位置 + [0, 序号]（本文件夹的问题）、位置 + [1, 子文件夹序号, ...]（子文件夹）、位置 + [2, 序号]（覆盖缺失等）
+        order_path = self._order_path
+        owner = self._shard is None or level >= self._shard['level'] or self._shard['index'] == 0
+        if self._shard is not None:
+            self._shard_owner = owner
+            self._order_prefix = order_path + [0]
         try:
-            items = list(current_path.iterdir())
-            folders = [item for item in items if item.is_dir()]
-            files = [item for item in items if item.is_file()]
+            try:
+                # 跟随符号链接时，检测当前文件夹是否已在遍历路径上（链接指向了上级目录）
+                dir_key = self.enter_directory(current_path)
+                # 有内容规则时遍历中顺便记下文件大小，供大小检查和重复内容分组使用
+                file_sizes = {} if self._size_rules or self._duplicate_rules or self._size_cache is not None else None
+                entries = self.open_directory(current_path, file_sizes)
+            except OSError as e:
+                if self._record_snapshot is not None:
+                    self._record_snapshot.record_error(self.relative_dir(current_path), e)
+                raise
             # --- 核心修复1: 正确初始化 current_list_values ---
             # 始终从 parent_list_values 复制，确保包含所有上级信息
             current_list_values = parent_list_values.copy()
+            folder_values = None  # 当前文件夹命名规则提取的列表值，没有命名规则时为 None
             # --- 核心修复2: 文件夹规则层级逻辑 ---
             # 只有当 level > 0 时，才检查当前文件夹的命名规则
             # level = 0 时，current_path 是用户选择的根目录，不检查其命名规则
@@ -597,151 +2123,978 @@ class FileStructureChecker:
                 # 使用 level - 1 作为键来查找文件夹规则
                 # 这样 level=1 时查找 self.folder_rules[0] (用户层级1)
                 #    level=2 时查找 self.folder_rules[1] (用户层级2)
+                # 同层有多条规则时，名称符合其中任意一条即可，列表匹配按符合的那条规则检查
                 folder_level_to_check = level - 1 
-                if folder_level_to_check in self.folder_rules:
-                    rule = self.folder_rules[folder_level_to_check]
-                    pattern = rule['pattern']
-                    if pattern:
-                        is_match, extracted_values = self.check_name_pattern(current_path.name, pattern)
-                        if not is_match:
-                            self.results.append({
-                                'type': '文件夹命名错误',
-                                'path': str(current_path),
-                                'level': folder_level_to_check + 1,  # 显示用户层级
-                                'message': f"文件夹 '{current_path.name}' 命名不符合要求: {rule['description']}",
-                                'expected': pattern,
-                                'actual_name': current_path.name
-                            })
-                        else:
-                            # --- 核心修复3: 更新 current_list_values 供子文件/文件夹使用 ---
-                            # 文件夹命名匹配成功，将其提取的列表值合并到 current_list_values
-                            # 这样，current_list_values 现在包含了：
-                            # 1. 祖父级及更上级传递下来的列表值 (parent_list_values.copy())
-                            # 2. 当前文件夹 newly 提取到的列表值 (extracted_values)
-                            current_list_values.update(extracted_values)
-                            # 检查列表匹配规则 (文件夹与上级文件夹的列表值比较)
-                            list_matching = rule.get('list_matching', {})
-                            for list_name, should_match_parent in list_matching.items():
-                                # 检查条件：
-                                # 1. 规则要求匹配 (should_match_parent is True)
-                                # 2. 父级(祖父级)有此列表值 (list_name in parent_list_values)
-                                # 3. 当前文件夹也提取到了此列表值 (list_name in extracted_values)
-                                if should_match_parent and list_name in parent_list_values and list_name in extracted_values:
-                                    # 比较父级列表值和当前文件夹提取的列表值是否相同
-                                    if parent_list_values[list_name] != extracted_values[list_name]:
-                                        self.results.append({
-                                            'type': '列表匹配错误',
-                                            'path': str(current_path),
-                                            'level': folder_level_to_check + 1,  # 显示用户层级
-                                            'message': f"文件夹 '{current_path.name}' 中的列表 '{list_name}' 值 '{extracted_values[list_name]}' 与上级文件夹值 '{parent_list_values[list_name]}' 不匹配",
-                                            'expected': pattern,
-                                            'actual_name': current_path.name
-                                        })
-            # 检查当前层级的文件 (文件规则层级逻辑保持不变)
-            # level = 0 时检查根目录下的文件 (用户层级1)
-            # level = 1 时检查根目录下第一层文件夹内的文件 (用户层级2)
-            file_level = level
-            if file_level in self.file_rules:
-                rule = self.file_rules[file_level]
-                pattern = rule['pattern']
-                extensions = rule['extensions']
-                for file_path in files:
-                    # 检查文件命名
-                    if pattern:
-                        is_match, extracted_values = self.check_name_pattern(file_path.stem, pattern)
-                        if not is_match:
-                            self.results.append({
-                                'type': '文件命名错误',
-                                'path': str(file_path),
-                                'level': file_level + 1,  # 显示用户层级
-                                'message': f"文件 '{file_path.name}' 命名不符合要求: {rule['description']}",
-                                'expected': pattern,
-                                'actual_name': file_path.stem
-                            })
-                        else:
-                            # --- 核心修复4: 文件列表匹配检查使用更新后的 current_list_values ---
-                            # 关键点: 文件列表匹配检查使用 current_list_values 而不是 parent_list_values
-                            # current_list_values 包含了：
-                            # 1. 祖父级的列表值 (从递归调用传入)
-                            # 2. 如果直接父文件夹命名匹配成功，还包含了直接父文件夹的列表值
-                            # 这使得文件可以与其直接父文件夹(如果父文件夹命名匹配)或祖父级文件夹进行列表值比较
-                            list_matching = rule.get('list_matching', {})
-                            for list_name, should_match_parent in list_matching.items():
-                                # 检查条件：
-                                # 1. 规则要求匹配 (should_match_parent is True)
-                                # 2. 父级(直接父文件夹)有此列表值 (list_name in current_list_values)
-                                #    这里的 current_list_values 是经过文件夹检查后可能更新的
-                                # 3. 当前文件也提取到了此列表值 (list_name in extracted_values)
-                                if should_match_parent and list_name in current_list_values and list_name in extracted_values:
-                                    # 比较父级列表值和当前文件提取的列表值是否相同
-                                    # 修复点: 错误信息中也使用 current_list_values 的值，保持一致性
-                                    if current_list_values[list_name] != extracted_values[list_name]:
-                                        self.results.append({
-                                            'type': '列表匹配错误',
-                                            'path': str(file_path),
-                                            'level': file_level + 1,  # 显示用户层级
-                                            'message': f"文件 '{file_path.name}' 中的列表 '{list_name}' 值 '{extracted_values[list_name]}' 与上级文件夹值 '{current_list_values[list_name]}' 不匹配",
-                                            'expected': pattern,
-                                            'actual_name': file_path.stem
-                                        })
-                    # 检查文件扩展名
-                    if extensions:
-                        if not self.check_extension(file_path, extensions):
-                            self.results.append({
-                                'type': '文件扩展名错误',
-                                'path': str(file_path),
-                                'level': file_level + 1,  # 显示用户层级
-                                'message': f"文件 '{file_path.name}' 扩展名不符合要求，应为: {', '.join(extensions)}",
-                                'expected': extensions
-                            })
-            # 递归检查子文件夹
-            for folder in folders:
-                # 传递更新后的 current_list_values
-                # 这确保了子文件夹和子文件能接收到当前文件夹(如果命名匹配)和所有上级文件夹的列表值
-                self.check_recursive(folder, level + 1, current_list_values)
+                rules = [rule for rule in self.rules_in_scope('folder', folder_level_to_check, current_path.parent, parent_list_values)
+                         if rule['pattern']]
+                if rules:
+                    patterns = tuple(rule['pattern'] for rule in rules)
+                    if name_match is None:
+                        positions, passed_values = self.classify_names_batch([current_path.name], patterns)
+                        name_match = (positions[0], passed_values.get(0, {}))
+                    rule_position, extracted_values = name_match
+                    folder_values = extracted_values if rule_position >= 0 else {}
+                    if rule_position == MATCH_TIMEOUT:
+                        self.add_result(self.match_timeout_result("文件夹", current_path, current_path.name, folder_level_to_check, patterns))
+                    elif rule_position < 0:
+                        self.add_result({
+                            'type': '文件夹命名错误',
+                            'path': str(current_path),
+                            'level': folder_level_to_check + 1,  # 显示用户层级
+                            'message': f"文件夹 '{current_path.name}' 命名不符合要求: {self.describe_rules(rules)}",
+                            'expected': ' | '.join(patterns),
+                            'actual_name': current_path.name
+                        })
+                    else:
+                        rule = rules[rule_position]
+                        pattern = rule['pattern']
+                        # --- 核心修复3: 更新 current_list_values 供子文件/文件夹使用 ---
+                        # 文件夹命名匹配成功，将其提取的列表值合并到 current_list_values
+                        # 这样，current_list_values 现在包含了：
+                        # 1. 祖父级及更上级传递下来的列表值 (parent_list_values.copy())
+                        # 2. 当前文件夹 newly 提取到的列表值 (extracted_values)
+                        current_list_values.update(extracted_values)
+                        # 检查列表匹配规则 (文件夹与上级文件夹的列表值比较)
+                        list_matching = rule.get('list_matching', {})
+                        for list_name, should_match_parent in list_matching.items():
+                            # 检查条件：
+                            # 1. 规则要求匹配 (should_match_parent is True)
+                            # 2. 父级(祖父级)有此列表值 (list_name in parent_list_values)
+                            # 3. 当前文件夹也提取到了此列表值 (list_name in extracted_values)
+                            if should_match_parent and list_name in parent_list_values and list_name in extracted_values:
+                                # 比较父级列表值和当前文件夹提取的列表值是否相同
+                                if parent_list_values[list_name] != extracted_values[list_name]:
+                                    self.add_result({
+                                        'type': '列表匹配错误',
+                                        'path': str(current_path),
+                                        'level': folder_level_to_check + 1,  # 显示用户层级
+                                        'message': f"文件夹 '{current_path.name}' 中的列表 '{list_name}' 值 '{extracted_values[list_name]}' 与上级文件夹值 '{parent_list_values[list_name]}' 不匹配",
+                                        'expected': pattern,
+                                        'actual_name': current_path.name
+                                    })
+                # 记录唯一性索引
+                if self._unique_rules['folder']:
+                    rel_path = self.relative_dir(current_path)
+                    parent_rel = rel_path.rsplit('/', 1)[0] if '/' in rel_path else '.'
+                    self.index_unique('folder', level - 1, parent_rel, current_path.name, str(current_path), folder_values)
+            # 逐块处理目录项：文件每攒满 DIRECTORY_CHUNK_SIZE 个就检查一批，
+            # 子文件夹只把名称放入有序队列，等本层文件检查完后再按名称依次递归
+            coverage = self.start_coverage(level)
+            has_file_rule = (bool(self.rules_in_scope('file', level, current_path, current_list_values)) or bool(self._unique_rules['file'])
+                             or bool(coverage and coverage['file']) or file_sizes is not None)
+            folder_names = SortedNameQueue()
+            file_chunk = []
+            for name, is_folder in entries:
+                if is_folder:
+                    folder_names.add(name)
+                elif has_file_rule:
+                    file_chunk.append(name)
+                    if len(file_chunk) >= DIRECTORY_CHUNK_SIZE:
+                        self.check_files(current_path, file_chunk, level, current_list_values, coverage, file_sizes)
+                        file_chunk = []
+            if file_chunk:
+                self.check_files(current_path, file_chunk, level, current_list_values, coverage, file_sizes)
+            # 子文件夹按名称顺序检查，问题顺序不受磁盘返回顺序影响，各分片合并后与完整检查的顺序一致
+            # 子文件夹的命名规则（子文件夹层级为 level + 1，对应规则键 level），逐块批量检查
+            folder_patterns = tuple(rule['pattern'] for rule in self.rules_in_scope('folder', level, current_path, current_list_values)
+                                    if rule['pattern'])
+            sorted_names = iter(folder_names)
+            start = 0
+            try:
+                while True:
+                    chunk = list(itertools.islice(sorted_names, DIRECTORY_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    if folder_patterns:
+                        positions, passed_values = self.classify_names_batch(chunk, folder_patterns)
+                    # 记录子文件夹覆盖的列表项
+                    if coverage and coverage['folder']:
+                        for index, folder_name in enumerate(chunk):
+                            extracted_values = passed_values.get(index, {}) if folder_patterns else None
+                            self.record_coverage(coverage['folder'], folder_name, extracted_values)
+                    # 递归检查子文件夹
+                    for index, folder_name in enumerate(chunk):
+                        folder_match = None
+                        if folder_patterns:
+                            folder_match = (positions[index], passed_values.get(index, {}))
+                        if self._shard is not None:
+                            # 只检查分到本分片的子树
+                            if level + 1 == self._shard['level'] and not self.owns_shard_subtree(current_path / folder_name):
+                                continue
+                            self._order_path = order_path + [1, start + index]
+                        # 传递更新后的 current_list_values
+                        # 这确保了子文件夹和子文件能接收到当前文件夹(如果命名匹配)和所有上级文件夹的列表值
+                        self.check_recursive(current_path / folder_name, level + 1, current_list_values, folder_match)
+                        if self._shard is not None:
+                            self._shard_owner = owner
+                            self._order_prefix = order_path + [2]
+                    start += len(chunk)
+            finally:
+                folder_names.close()
+            if self._shard is not None:
+                self._order_prefix = order_path + [2]
+            # 本文件夹下的文件和子文件夹都已处理，报告缺失的列表项
+            if coverage:
+                self.report_coverage(current_path, coverage)
+        except SymlinkLoopError:
+            self.add_result({
+                'type': '符号链接循环',
+                'path': str(current_path),
+                'level': level + 1,  # 显示用户层级
+                'message': f"文件夹 '{current_path}' 指向其上级目录，已跳过以避免无限循环"
+            })
         except PermissionError:
-            self.results.append({
+            self.add_result({
                 'type': '权限错误',
                 'path': str(current_path),
                 'level': level + 1,  # 显示用户层级
                 'message': f"无法访问文件夹 '{current_path}'，权限不足"
             })
         except Exception as e:
-            self.results.append({
+            self.add_result({
                 'type': '检查错误',
                 'path': str(current_path),
                 'level': level + 1,  # 显示用户层级
                 'message': f"检查文件夹 '{current_path}' 时出错: {str(e)}"
             })
+        finally:
+            if dir_key is not None:
+                self._active_dirs.discard(dir_key)
+
+    def match_timeout_result(self, kind: str, path: Path, name: str, internal_level: int, patterns: Tuple[str, ...]) -> dict:
+        """名称匹配超时的检查结果（kind 为文件夹或文件）"""
+        return {
+            'type': '匹配超时',
+            'path': str(path),
+            'level': internal_level + 1,  # 显示用户层级
+            'message': f"{kind} '{path.name}' 的命名检查超过 {self.match_time_limit:g} 秒仍未完成，已跳过（模式可能存在回溯风险）",
+            'expected': ' | '.join(patterns),
+            'actual_name': name
+        }
+
+    def check_files(self, current_path: Path, file_names: List[str], level: int, current_list_values: Dict[str, str],
+                    coverage: Optional[Dict[str, list]] = None, file_sizes: Optional[Dict[str, int]] = None):
+        """检查文件夹下的一批文件（命名、列表匹配和扩展名），并记录唯一性索引、覆盖情况和内容规则"""
+        # 检查当前层级的文件 (文件规则层级逻辑保持不变)
+        # level = 0 时检查根目录下的文件 (用户层级1)
+        # level = 1 时检查根目录下第一层文件夹内的文件 (用户层级2)
+        file_level = level
+        files = [current_path / name for name in file_names]
+        rules = self.rules_in_scope('file', file_level, current_path, current_list_values)
+        named_positions = tuple(position for position, rule in enumerate(rules) if rule['pattern'])
+        file_rule_positions = [-1] * len(files)  # 每个文件符合的规则序号，-1 表示都不符合
+        passed_values = {}
+        if named_positions:
+            # 同层有多条规则时，先只用扩展名允许该文件的规则匹配（未限定扩展名的规则适用于所有文件），
+            # 每组候选规则合并为一个正则整批匹配
+            groups = {}  # {候选规则序号: [文件索引]}
+            candidates_by_suffix = {}
+            for index, file_path in enumerate(files):
+                suffix = file_path.suffix.lower()
+                candidates = candidates_by_suffix.get(suffix)
+                if candidates is None:
+                    candidates = tuple(position for position in named_positions
+                                       if self.check_extension(file_path, rules[position]['extensions']))
+                    candidates_by_suffix[suffix] = candidates
+                groups.setdefault(candidates, []).append(index)
+            # 候选规则都不符合的文件再用本层全部规则匹配，以区分命名错误和扩展名错误
+            retry_indexes = []
+            for candidates, indexes in groups.items():
+                if candidates:
+                    positions, values = self.classify_names_batch([files[index].stem for index in indexes],
+                                                                  tuple(rules[position]['pattern'] for position in candidates))
+                    for group_index, index in enumerate(indexes):
+                        if positions[group_index] >= 0:
+                            file_rule_positions[index] = candidates[positions[group_index]]
+                            passed_values[index] = values[group_index]
+                        elif positions[group_index] == MATCH_TIMEOUT:
+                            file_rule_positions[index] = MATCH_TIMEOUT
+                        elif candidates != named_positions:
+                            retry_indexes.append(index)
+                else:
+                    retry_indexes.extend(indexes)
+            if retry_indexes:
+                positions, values = self.classify_names_batch([files[index].stem for index in retry_indexes],
+                                                              tuple(rules[position]['pattern'] for position in named_positions))
+                for group_index, index in enumerate(retry_indexes):
+                    if positions[group_index] >= 0:
+                        file_rule_positions[index] = named_positions[positions[group_index]]
+                        passed_values[index] = values[group_index]
+                    elif positions[group_index] == MATCH_TIMEOUT:
+                        file_rule_positions[index] = MATCH_TIMEOUT
+        if rules:
+            # 名称不符合任何规则时，扩展名按本层所有规则允许的扩展名检查（有规则不限扩展名时不检查）
+            all_extensions = []
+            if all(rule['extensions'] for rule in rules):
+                for rule in rules:
+                    all_extensions.extend(ext for ext in rule['extensions'] if ext not in all_extensions)
+            for index, file_path in enumerate(files):
+                rule_position = file_rule_positions[index]
+                # 检查文件命名
+                if named_positions:
+                    if rule_position == MATCH_TIMEOUT:
+                        patterns = tuple(rules[position]['pattern'] for position in named_positions)
+                        self.add_result(self.match_timeout_result("文件", file_path, file_path.stem, file_level, patterns))
+                    elif rule_position < 0:
+                        named_rules = [rules[position] for position in named_positions]
+                        self.add_result({
+                            'type': '文件命名错误',
+                            'path': str(file_path),
+                            'level': file_level + 1,  # 显示用户层级
+                            'message': f"文件 '{file_path.name}' 命名不符合要求: {self.describe_rules(named_rules)}",
+                            'expected': ' | '.join(rule['pattern'] for rule in named_rules),
+                            'actual_name': file_path.stem
+                        })
+                    else:
+                        rule = rules[rule_position]
+                        pattern = rule['pattern']
+                        extracted_values = passed_values[index]
+                        # --- 核心修复4: 文件列表匹配检查使用更新后的 current_list_values ---
+                        # 关键点: 文件列表匹配检查使用 current_list_values 而不是 parent_list_values
+                        # current_list_values 包含了：
+                        # 1. 祖父级的列表值 (从递归调用传入)
+                        # 2. 如果直接父文件夹命名匹配成功，还包含了直接父文件夹的列表值
+                        # 这使得文件可以与其直接父文件夹(如果父文件夹命名匹配)或祖父级文件夹进行列表值比较
+                        list_matching = rule.get('list_matching', {})
+                        for list_name, should_match_parent in list_matching.items():
+                            # 检查条件：
+                            # 1. 规则要求匹配 (should_match_parent is True)
+                            # 2. 父级(直接父文件夹)有此列表值 (list_name in current_list_values)
+                            #    这里的 current_list_values 是经过文件夹检查后可能更新的
+                            # 3. 当前文件也提取到了此列表值 (list_name in extracted_values)
+                            if should_match_parent and list_name in current_list_values and list_name in extracted_values:
+                                # 比较父级列表值和当前文件提取的列表值是否相同
+                                # 修复点: 错误信息中也使用 current_list_values 的值，保持一致性
+                                if current_list_values[list_name] != extracted_values[list_name]:
+                                    self.add_result({
+                                        'type': '列表匹配错误',
+                                        'path': str(file_path),
+                                        'level': file_level + 1,  # 显示用户层级
+                                        'message': f"文件 '{file_path.name}' 中的列表 '{list_name}' 值 '{extracted_values[list_name]}' 与上级文件夹值 '{current_list_values[list_name]}' 不匹配",
+                                        'expected': pattern,
+                                        'actual_name': file_path.stem
+                                    })
+                # 检查文件扩展名
+                extensions = rules[rule_position]['extensions'] if rule_position >= 0 else all_extensions
+                if extensions:
+                    if not self.check_extension(file_path, extensions):
+                        self.add_result({
+                            'type': '文件扩展名错误',
+                            'path': str(file_path),
+                            'level': file_level + 1,  # 显示用户层级
+                            'message': f"文件 '{file_path.name}' 扩展名不符合要求，应为: {', '.join(extensions)}",
+                            'expected': extensions
+                        })
+        # 记录唯一性索引
+        if self._unique_rules['file']:
+            parent_rel = self.relative_dir(current_path)
+            for index, file_path in enumerate(files):
+                extracted_values = passed_values.get(index, {}) if named_positions else None
+                self.index_unique('file', file_level, parent_rel, file_path.stem, str(file_path), extracted_values)
+        # 记录覆盖的列表项
+        if coverage and coverage['file']:
+            for index, file_path in enumerate(files):
+                extracted_values = passed_values.get(index, {}) if named_positions else None
+                self.record_coverage(coverage['file'], file_path.stem, extracted_values)
+        # 内容规则
+        if file_sizes is not None:
+            self.check_file_contents(files, file_level, file_sizes)
+
+    def check_file_contents(self, files: List[Path], level: int, file_sizes: Dict[str, int]):
+        """检查文件大小，并按大小记录重复内容的候选文件
+
+        file_sizes 为遍历时记下的文件大小，用过即删除；复查缓存的目录树时没有记录，改为单独读取
+        """
+        size_rules = [(rule_index, rule) for rule_index, rule in self._size_rules
+                      if rule.get('level') is None or rule['level'] == level]
+        duplicate_rules = [(rule_index, rule) for rule_index, rule in self._duplicate_rules
+                           if rule.get('level') is None or rule['level'] == level]
+        size_cache = self._size_cache
+        for file_path in files:
+            size = file_sizes.pop(file_path.name, None)
+            # 同时检查多个预设时，文件大小只读取一次
+            if size_cache is not None:
+                if size is None:
+                    size = size_cache.get(str(file_path))
+                else:
+                    size_cache[str(file_path)] = size
+            if not size_rules and not duplicate_rules:
+                continue
+            if size is None:
+                try:
+                    size = os.stat(file_path).st_size
+                except OSError:
+                    continue
+                if size_cache is not None:
+                    size_cache[str(file_path)] = size
+            for rule_index, rule in size_rules:
+                min_size = rule.get('min_size')
+                max_size = rule.get('max_size')
+                if min_size is not None and size < min_size:
+                    problem = f"小于下限 {format_size(min_size)}"
+                elif max_size is not None and size > max_size:
+                    problem = f"超过上限 {format_size(max_size)}"
+                else:
+                    continue
+                self.add_result({
+                    'type': '文件大小错误',
+                    'path': str(file_path),
+                    'level': level + 1,  # 显示用户层级
+                    'message': f"文件 '{file_path.name}' 大小为 {format_size(size)}，{problem}: {rule.get('description', '')}",
+                    'expected': self.describe_constraint_rule(rule)
+                })
+            for rule_index, rule in duplicate_rules:
+                if size >= rule.get('min_size', 1) and self._shard_owner:
+                    self._duplicate_candidates[rule_index].setdefault(size, []).append(self.shard_entry(str(file_path), level + 1))
+
+    def unique_scope(self, parent_rel: str, scope_level: Optional[int]) -> Optional[str]:
+        """唯一性范围：所在的第 scope_level 层文件夹的相对路径，整个目录树为 ''，不在任何范围内时为 None"""
+        if scope_level is None:
+            return ''
+        parts = [] if parent_rel == '.' else parent_rel.split('/')
+        if len(parts) < scope_level + 1:
+            return None
+        return '/'.join(parts[:scope_level + 1])
+
+    def index_unique(self, target: str, level: int, parent_rel: str, name: str, path: str,
+                     extracted_values: Optional[Dict[str, str]]):
+        """把名称或列表值记入唯一性索引
+
+        extracted_values 为命名规则提取的列表值，该层没有命名规则时为 None
+        """
+        if not self._shard_owner:
+            return
+        for rule_index, rule in self._unique_rules[target]:
+            if rule.get('level') is not None and rule['level'] != level:
+                continue
+            scope = self.unique_scope(parent_rel, rule.get('scope_level'))
+            if scope is None:
+                continue
+            key_list = rule.get('key')
+            if key_list:
+                if extracted_values is None:
+                    # 该层没有命名规则，直接在名称中查找列表项
+                    value = self.extract_list_values(name, f'[{key_list}]').get(key_list)
+                else:
+                    value = extracted_values.get(key_list)
+                if value is None:
+                    continue
+            else:
+                value = self.name_normalizer.normalize(name).strip().casefold()
+            index_key = (rule_index, scope, value)
+            entry = self.shard_entry(path, level + 1)
+            existing = self._unique_index.get(index_key)
+            if existing is None:
+                self._unique_index[index_key] = entry
+            elif isinstance(existing, list):
+                existing.append(entry)
+            else:
+                self._unique_index[index_key] = [existing, entry]
+
+    def report_unique_conflicts(self):
+        """遍历结束后报告唯一性冲突，无需再次遍历"""
+        for (rule_index, scope, value), entries in self._unique_index.items():
+            if not isinstance(entries, list):
+                continue
+            rule = self.constraint_rules[rule_index]
+            first_path = entries[0][0]
+            for path, user_level in entries[1:]:
+                self.add_result({
+                    'type': '唯一性冲突',
+                    'path': path,
+                    'level': user_level,
+                    'message': f"'{value}' 与 '{first_path}' 重复: {rule.get('description', '')}",
+                    'expected': self.describe_constraint_rule(rule),
+                    'actual_name': value
+                })
+        self._unique_index = {}
+
+    @staticmethod
+    def compute_digests(executor: ThreadPoolExecutor, pending: Dict[str, int], hash_func, digests: Dict[str, Optional[bytes]]):
+        """在线程池中计算 pending {路径: 文件大小} 中各文件的哈希，写入 digests（读取失败为 None）"""
+        paths = list(pending)
+
+        def safe_hash(path: str) -> Optional[bytes]:
+            try:
+                return hash_func(path, pending[path])
+            except (OSError, ValueError):
+                return None
+
+        for path, digest in zip(paths, executor.map(safe_hash, paths)):
+            digests[path] = digest
+
+    def split_by_hash(self, executor: ThreadPoolExecutor, groups: List[Tuple[int, list]], hash_func,
+                      digests: Dict[str, Optional[bytes]]) -> List[Tuple[int, list]]:
+        """在线程池中计算哈希，把每组文件按哈希再细分，只保留仍有多个文件的组
+
+        groups 为 [(文件大小, [(路径, 层级), ...])]，digests 缓存已计算的哈希（读取失败为 None）
+        """
+        pending = {}
+        for size, entries in groups:
+            for path, _ in entries:
+                if path not in digests:
+                    pending[path] = size
+        self.compute_digests(executor, pending, hash_func, digests)
+        split_groups = []
+        for size, entries in groups:
+            by_digest = {}
+            for entry in entries:
+                digest = digests[entry[0]]
+                if digest is not None:
+                    by_digest.setdefault(digest, []).append(entry)
+            split_groups.extend((size, same) for same in by_digest.values() if len(same) > 1)
+        return split_groups
+
+    def report_duplicate_content(self, block_digests: Optional[Dict[str, Optional[bytes]]] = None,
+                                 content_digests: Optional[Dict[str, Optional[bytes]]] = None):
+        """遍历结束后报告内容重复的文件
+
+        只有大小相同的文件才可能重复；再比较开头和末尾各一块的哈希，仍相同且文件较大的才读取完整内容比较。
+        合并分片结果时传入各分片算好的哈希 {路径: 哈希}，不再读取文件
+        """
+        if not self._duplicate_rules:
+            return
+        block_digests = {} if block_digests is None else block_digests
+        content_digests = {} if content_digests is None else content_digests
+        with ThreadPoolExecutor(max_workers=CONTENT_HASH_WORKERS) as executor:
+            for rule_index, rule in self._duplicate_rules:
+                groups = [(size, entries) for size, entries in self._duplicate_candidates[rule_index].items() if len(entries) > 1]
+                groups = self.split_by_hash(executor, groups, hash_file_blocks, block_digests)
+                # 不超过两块的文件，部分哈希已覆盖完整内容
+                small_groups = [(size, entries) for size, entries in groups if size <= 2 * CONTENT_HASH_BLOCK_SIZE]
+                large_groups = [(size, entries) for size, entries in groups if size > 2 * CONTENT_HASH_BLOCK_SIZE]
+                groups = small_groups + self.split_by_hash(executor, large_groups, hash_file_contents, content_digests)
+                for size, entries in groups:
+                    first_path = entries[0][0]
+                    for path, user_level in entries[1:]:
+                        self.add_result({
+                            'type': '重复内容',
+                            'path': path,
+                            'level': user_level,
+                            'message': f"文件 '{os.path.basename(path)}' 与 '{first_path}' 内容相同（共 {len(entries)} 份，每份 {format_size(size)}）: {rule.get('description', '')}",
+                            'expected': self.describe_constraint_rule(rule)
+                        })
+        self._duplicate_candidates = {}
+
+    def start_coverage(self, level: int) -> Optional[Dict[str, list]]:
+        """为遍历层级为 level 的文件夹准备覆盖记录 {对象: [[规则序号, rule_dict, {列表项: 位}, 已出现的位], ...]}"""
+        if level not in self._coverage_rules:
+            return None
+        coverage = {'folder': [], 'file': []}
+        for rule_index, rule, item_bits in self._coverage_rules[level]:
+            coverage[rule['target']].append([rule_index, rule, item_bits, 0])
+        return coverage
+
+    def record_coverage(self, records: list, name: str, extracted_values: Optional[Dict[str, str]]):
+        """记录名称中出现的列表项
+
+        extracted_values 为命名规则提取的列表值，该层没有命名规则时为 None
+        """
+        for record in records:
+            key_list = record[1]['key']
+            if extracted_values is None:
+                # 该层没有命名规则，直接在名称中查找列表项
+                value = self.extract_list_values(name, f'[{key_list}]').get(key_list)
+            else:
+                value = extracted_values.get(key_list)
+            if value is not None:
+                record[3] |= record[2].get(value, 0)
+
+    def report_coverage(self, current_path: Path, coverage: Dict[str, list]):
+        """报告文件夹下缺失的列表项"""
+        for records in coverage.values():
+            for rule_index, rule, item_bits, found in records:
+                missing = [item for item, bit in item_bits.items() if not found & bit]
+                if missing:
+                    target = '文件夹' if rule['target'] == 'folder' else '文件'
+                    self.add_result({
+                        'type': '覆盖缺失',
+                        'path': str(current_path),
+                        'level': rule['level'] + 1,  # 显示用户层级
+                        'message': f"文件夹 '{current_path.name}' 下缺少 [{rule['key']}] 中 {len(missing)} 项对应的{target}: {', '.join(missing)} ({rule.get('description', '')})",
+                        'expected': self.describe_constraint_rule(rule)
+                    })
+
+    def result_key(self, result: dict) -> Tuple[str, str, str]:
+        """生成问题的基线键 (类型, 相对根目录的路径, 规则)"""
+        path = result['path']
+        if self._check_root:
+            try:
+                path = os.path.relpath(path, self._check_root)
+            except ValueError:
+                pass
+        expected = result.get('expected', '')
+        if isinstance(expected, list):
+            expected = ','.join(expected)
+        return result['type'], path.replace(os.sep, '/'), expected
+
+    def add_result(self, result: dict):
+        """记录一个问题，基线中已知的问题只计数不记录"""
+        if self._shard is not None:
+            if not self._shard_owner:
+                return
+            result['order'] = self._order_prefix + [next(self._order_counter)]
+        if self.baseline_keys:
+            key = self.result_key(result)
+            if key in self.baseline_keys:
+                self._baseline_seen.add(key)
+                self.suppressed_count += 1
+                return
+        self.results.append(result)
+
+    def resolved_baseline_keys(self) -> List[Tuple[str, str, str]]:
+        """基线中本次检查未再出现的问题（已解决）"""
+        return sorted(self.baseline_keys - self._baseline_seen)
+
+    def run_check(self, root_folder: Path, rescan: bool = False, target: Optional[Path] = None) -> List[dict]:
+        """检查指定根目录，返回新发现的问题
+
+        已缓存同一根目录的目录树时直接据此复查，rescan 为 True 时强制重新扫描磁盘。
+        target 为根目录下的文件夹或文件时只检查它（文件夹连同其下内容），唯一性和重复内容也只在其中比较
+        """
+        self.results = []
+        self.suppressed_count = 0
+        self._baseline_seen = set()
+        self._check_root = str(root_folder)
+        self._walk_root = os.path.realpath(root_folder)
+        self._active_dirs = set()
+        snapshot = self.tree_snapshot
+        if not rescan and snapshot is not None and snapshot.matches(self._check_root, self.symlink_policy, self.skip_hidden):
+            self._replay_snapshot = snapshot
+            # 缓存中被 refresh_tree 删除的文件夹重新读取磁盘，并补记到同一个目录树中
+            self._record_snapshot = snapshot
+        elif self.cache_tree or self.preset_checkers:
+            # 同时检查其它预设时，它们复查本次记录的目录树，不再重复读取磁盘
+            self._record_snapshot = TreeSnapshot(self._check_root, self.symlink_policy, self.skip_hidden)
+        self.last_check_from_cache = self._replay_snapshot is not None
+        self._unique_rules = {'folder': [], 'file': []}
+        for rule_index, rule in enumerate(self.constraint_rules):
+            if rule['type'] == 'unique':
+                self._unique_rules[rule['target']].append((rule_index, rule))
+        # 覆盖规则：列表项编号为位，每个文件夹用一个整数记录已出现的项
+        self._coverage_rules = {}
+        for rule_index, rule in enumerate(self.constraint_rules):
+            if rule['type'] == 'coverage':
+                items = dict.fromkeys(self.name_normalizer.normalize_uncached(item) for item in self.custom_lists.get(rule['key'], []))
+                item_bits = {item: 1 << bit for bit, item in enumerate(items)}
+                # 文件、文件夹的内部层级都等于其所在文件夹的遍历层级
+                self._coverage_rules.setdefault(rule['level'], []).append((rule_index, rule, item_bits))
+        self._unique_index = {}
+        # 内容规则：文件大小取自遍历时的 stat 信息，重复内容在遍历结束后统一比较
+        self._size_rules = [(rule_index, rule) for rule_index, rule in enumerate(self.constraint_rules) if rule['type'] == 'size']
+        self._duplicate_rules = [(rule_index, rule) for rule_index, rule in enumerate(self.constraint_rules) if rule['type'] == 'duplicate']
+        self._duplicate_candidates = {rule_index: {} for rule_index, _ in self._duplicate_rules}
+        self._scope_tries = self.build_scope_tries()
+        if self.preset_checkers and self._shard is None:
+            # 其它预设有内容规则时，本次遍历就记下文件大小，它们复查目录树时不必再读取
+            self._size_cache = {} if any(rule['type'] in ('size', 'duplicate') for checker in self.preset_checkers.values()
+                                         for rule in checker.constraint_rules) else None
+        try:
+            if target is None:
+                self.check_recursive(root_folder)
+            else:
+                self.check_target(root_folder, target)
+            # 分片检查时唯一性冲突和重复内容要在合并各分片后才能确定
+            if self._shard is None:
+                self.report_unique_conflicts()
+                self.report_duplicate_content()
+            if self._record_snapshot is not None:
+                self.tree_snapshot = self._record_snapshot
+        finally:
+            self._record_snapshot = None
+            self._replay_snapshot = None
+        if self.preset_checkers and self._shard is None:
+            self.run_preset_checks(root_folder, target)
+        return self.results
+
+    def check_target(self, root_folder: Path, target: Path):
+        """只检查根目录下的一个文件夹或文件，上级文件夹只按命名规则提取列表值，不读取磁盘、不报告问题"""
+        parts = Path(os.path.relpath(target, root_folder)).parts
+        if parts == (os.curdir,):
+            parts = ()
+        current_path = root_folder
+        list_values = {}
+        for level, name in enumerate(parts[:-1], 1):
+            list_values = self.inherited_list_values(current_path, name, level, list_values)
+            current_path = current_path / name
+        if not parts or os.path.isdir(target):
+            self.check_recursive(target, len(parts), list_values)
+        else:
+            file_sizes = {} if self._size_rules or self._duplicate_rules or self._size_cache is not None else None
+            self.check_files(current_path, [target.name], len(parts) - 1, list_values, None, file_sizes)
+
+    def inherited_list_values(self, parent_path: Path, name: str, level: int, parent_list_values: Dict[str, str]) -> Dict[str, str]:
+        """第 level 层文件夹传给下层的列表值（与 check_recursive 相同：名称符合规则时合并其提取的列表值）"""
+        list_values = dict(parent_list_values)
+        rules = [rule for rule in self.rules_in_scope('folder', level - 1, parent_path, parent_list_values) if rule['pattern']]
+        if rules:
+            positions, passed_values = self.classify_names_batch([name], tuple(rule['pattern'] for rule in rules))
+            if positions[0] >= 0:
+                list_values.update(passed_values[0])
+        return list_values
+
+    def run_preset_checks(self, root_folder: Path, target: Optional[Path] = None):
+        """用同时加载的其它预设复查本次记录的目录树，各预设的列表值继承和约束规则互不影响，问题标注所属预设"""
+        for result in self.results:
+            result['preset'] = self.preset_name
+        snapshot = self.tree_snapshot
+        try:
+            for name, checker in self.preset_checkers.items():
+                # 遍历选项、基线和限时匹配的子进程与本检查器相同
+                checker.symlink_policy = self.symlink_policy
+                checker.skip_hidden = self.skip_hidden
+                checker.set_name_normalization(self.name_normalizer.nfc, self.name_normalizer.width_folding)
+                checker.match_time_limit = self.match_time_limit
+                checker.match_guard = self.match_guard
+                checker.baseline_keys = self.baseline_keys
+                checker.cache_tree = False
+                checker.tree_snapshot = snapshot
+                checker._size_cache = self._size_cache
+                try:
+                    for result in checker.run_check(root_folder, target=target):
+                        result['preset'] = name
+                        self.results.append(result)
+                finally:
+                    checker.tree_snapshot = None
+                    checker._size_cache = None
+                self.suppressed_count += checker.suppressed_count
+                self._baseline_seen |= checker._baseline_seen
+        finally:
+            self._size_cache = None
+            if not self.cache_tree:
+                self.tree_snapshot = None
+
+    def add_preset_file(self, file_path: str) -> str:
+        """加载一个同时检查的预设，返回其名称（文件名，重名时加序号）"""
+        checker = FileStructureChecker(gui=False)
+        checker.load_preset_file(file_path)
+        name = Path(file_path).stem
+        candidate = name
+        suffix = 2
+        while candidate == self.preset_name or candidate in self.preset_checkers:
+            candidate = f"{name} ({suffix})"
+            suffix += 1
+        checker.preset_name = candidate
+        self.preset_checkers[candidate] = checker
+        return candidate
+
+    def remove_preset(self, name: str):
+        """移除一个同时检查的预设"""
+        del self.preset_checkers[name]
+
+    def format_results(self) -> str:
+        """把检查结果整理为报告文本（界面显示和命令行输出共用）"""
+        lines = []
+        if self.last_check_from_cache:
+            lines.append(f"ℹ️ 使用缓存的目录树（扫描于 {self.tree_snapshot.scanned_at}），磁盘内容有变化时请点击“重新扫描磁盘”\n")
+        if not self.results:
+            lines.append("🎉 恭喜！所有文件结构都符合要求。\n")
+            lines.append("✅ 文件夹结构完全正确，无需修改。")
+        else:
+            lines.append(f"❌ 发现 {len(self.results)} 个问题需要修正：\n")
+            for i, result in enumerate(self.results, 1):
+                lines.append(f"{i}. [{result['type']}]\n")
+                if 'preset' in result:
+                    lines.append(f"   预设: {result['preset']}\n")
+                lines.append(f"   路径: {result['path']}\n")
+                lines.append(f"   问题: {result['message']}\n")
+                if 'actual_name' in result:
+                    lines.append(f"   实际名称: {result['actual_name']}\n")
+                if 'expected' in result:
+                    lines.append(f"   期望模式: {result['expected']}\n")
+                lines.append("\n")
+        if self.baseline_keys:
+            resolved = self.resolved_baseline_keys()
+            lines.append(f"\n📋 基线：已忽略 {self.suppressed_count} 个已知问题，{len(resolved)} 个基线问题已解决\n")
+            for i, (result_type, path, expected) in enumerate(resolved[:RESOLVED_DISPLAY_LIMIT], 1):
+                lines.append(f"{i}. [已解决][{result_type}] {path}\n")
+            if len(resolved) > RESOLVED_DISPLAY_LIMIT:
+                lines.append(f"……其余 {len(resolved) - RESOLVED_DISPLAY_LIMIT} 个已解决问题未显示\n")
+        return ''.join(lines)
 
-    def run_check_gui(self):
+    def refresh_tree(self, paths: List[Path]):
+        """让缓存的目录树在下次检查时重新读取这些路径（文件夹连同其下内容，以及所在文件夹的列表）"""
+        snapshot = self.tree_snapshot
+        if snapshot is None:
+            return
+        for path in paths:
+            rel_path = os.path.relpath(path, snapshot.root).replace(os.sep, '/')
+            snapshot.forget(rel_path)
+            if rel_path != '.':
+                snapshot.forget(os.path.dirname(rel_path) or '.', recursive=False)
+
+    def check_options(self) -> dict:
+        """影响检查结果的遍历和名称规范化选项"""
+        return {
+            'symlink_policy': self.symlink_policy,
+            'skip_hidden': self.skip_hidden,
+            'nfc': self.name_normalizer.nfc,
+            'width_folding': self.name_normalizer.width_folding,
+            'match_time_limit': self.match_time_limit
+        }
+
+    def owns_shard_subtree(self, folder_path: Path) -> bool:
+        """分片根目录是否分给本分片（按相对路径的 CRC32 分配，各机器上结果一致）"""
+        rel_path = self.relative_dir(folder_path)
+        return zlib.crc32(rel_path.encode('utf-8')) % self._shard['count'] == self._shard['index']
+
+    def shard_entry(self, path: str, user_level: int) -> tuple:
+        """唯一性索引和重复内容候选的条目，分片检查时附带排序键"""
+        if self._shard is None:
+            return (path, user_level)
+        return (path, user_level, self._order_prefix + [next(self._order_counter)])
+
+    def run_shard(self, root_folder: Path, shard_index: int, shard_count: int, shard_level: int = 1) -> dict:
+        """分片检查：只检查第 shard_level 层中分给本分片的子树，返回可合并的部分结果
+
+        分片根目录以上的文件夹每个分片都会遍历（以便提取列表值传给下层），其中的问题只由 0 号分片报告；
+        唯一性索引和重复内容候选原样写入部分结果，合并时统一判断；重复内容候选的哈希在本分片中算好，合并时不再读取文件
+        """
+        if shard_count < 1 or not 0 <= shard_index < shard_count:
+            raise ValueError(f"分片序号必须在 0 到 {shard_count - 1} 之间")
+        if shard_level < 1:
+            raise ValueError("分片层级必须大于等于1")
+        started_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        self._shard = {'index': shard_index, 'count': shard_count, 'level': shard_level}
+        self._order_path = []
+        self._order_counter = itertools.count()
+        try:
+            results = self.run_check(root_folder, rescan=True)
+            unique_index = [[rule_index, scope, value, entries if isinstance(entries, list) else [entries]]
+                            for (rule_index, scope, value), entries in self._unique_index.items()]
+            duplicate_candidates = [[rule_index, [[size, entries] for size, entries in by_size.items()]]
+                                    for rule_index, by_size in self._duplicate_candidates.items()]
+            content_digests = self.shard_content_digests()
+        finally:
+            self._shard = None
+            self._shard_owner = True
+            self._order_path = None
+            self._order_prefix = []
+            self._order_counter = None
+            self._unique_index = {}
+            self._duplicate_candidates = {}
+        return {
+            'format': SHARD_FILE_FORMAT,
+            'version': SHARD_FILE_VERSION,
+            'root': self._check_root,
+            'shard_index': shard_index,
+            'shard_count': shard_count,
+            'shard_level': shard_level,
+            'options': self.check_options(),
+            'preset': self.preset_data(),
+            'started_at': started_at,
+            'finished_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'results': results,
+            'unique_index': unique_index,
+            'duplicate_candidates': duplicate_candidates,
+            'content_digests': content_digests
+        }
+
+    def shard_content_digests(self) -> Dict[str, list]:
+        """本分片重复内容候选的哈希 {路径: [开头和末尾各一块的哈希, 完整内容的哈希]}（十六进制，读取失败为 None）
+
+        其它分片可能有大小相同的文件，所以每个候选都要计算；不超过两块的文件，部分哈希即为完整内容的哈希
+        """
+        sizes = {}
+        for by_size in self._duplicate_candidates.values():
+            for size, entries in by_size.items():
+                for entry in entries:
+                    sizes[entry[0]] = size
+        block_digests = {}
+        content_digests = {}
+        with ThreadPoolExecutor(max_workers=CONTENT_HASH_WORKERS) as executor:
+            self.compute_digests(executor, sizes, hash_file_blocks, block_digests)
+            large = {path: size for path, size in sizes.items() if size > 2 * CONTENT_HASH_BLOCK_SIZE and block_digests[path] is not None}
+            self.compute_digests(executor, large, hash_file_contents, content_digests)
+        digests = {}
+        for path, block_digest in block_digests.items():
+            content_digest = content_digests.get(path, block_digest) if path in large else block_digest
+            digests[path] = [digest.hex() if digest is not None else None for digest in (block_digest, content_digest)]
+        return digests
+
+    def merge_shard_results(self, partials: List[dict]) -> List[dict]:
+        """合并各分片的部分结果，得到与一次完整检查相同的问题列表（包括顺序）"""
+        if not partials:
+            raise ValueError("没有要合并的分片结果")
+        first = partials[0]
+        for partial in partials:
+            if partial.get('format') != SHARD_FILE_FORMAT or partial.get('version') != SHARD_FILE_VERSION:
+                raise ValueError("不是本工具生成的分片结果文件，或版本不一致")
+            for key in ('root', 'shard_count', 'shard_level', 'options', 'preset'):
+                if partial[key] != first[key]:
+                    raise ValueError(f"分片结果不一致（{key}），请确认各分片使用相同的根目录、预设和选项")
+        shard_count = first['shard_count']
+        indexes = sorted(partial['shard_index'] for partial in partials)
+        if indexes != list(range(shard_count)):
+            missing = sorted(set(range(shard_count)) - set(indexes))
+            raise ValueError(f"分片不完整或重复：共 {shard_count} 个分片，缺少 {missing}，收到 {indexes}")
+        # 按分片时的预设和选项复原检查环境
+        self.apply_preset(first['preset'])
+        options = first['options']
+        self.symlink_policy = options['symlink_policy']
+        self.skip_hidden = options['skip_hidden']
+        self.set_name_normalization(options['nfc'], options['width_folding'])
+        self.results = []
+        self.suppressed_count = 0
+        self._baseline_seen = set()
+        self.last_check_from_cache = False
+        self._check_root = first['root']
+        # 遍历中发现的问题按排序键恢复全量检查的顺序
+        for result in sorted((result for partial in partials for result in partial['results']), key=lambda result: result['order']):
+            result = dict(result)
+            del result['order']
+            self.add_result(result)
+        # 唯一性索引：键按首次出现的位置排列，条目按遍历位置排列
+        merged_index = {}
+        for partial in partials:
+            for rule_index, scope, value, entries in partial['unique_index']:
+                merged_index.setdefault((rule_index, scope, value), []).extend(entries)
+        self._unique_index = {}
+        for index_key, entries in sorted(merged_index.items(), key=lambda item: min(entry[2] for entry in item[1])):
+            entries.sort(key=lambda entry: entry[2])
+            merged_entries = [(path, user_level) for path, user_level, _ in entries]
+            self._unique_index[index_key] = merged_entries if len(merged_entries) > 1 else merged_entries[0]
+        self.report_unique_conflicts()
+        # 重复内容：合并各分片的同大小候选后，按各分片算好的哈希分组
+        self._duplicate_rules = [(rule_index, rule) for rule_index, rule in enumerate(self.constraint_rules) if rule['type'] == 'duplicate']
+        merged_candidates = {rule_index: {} for rule_index, _ in self._duplicate_rules}
+        for partial in partials:
+            for rule_index, sizes in partial['duplicate_candidates']:
+                for size, entries in sizes:
+                    merged_candidates[rule_index].setdefault(size, []).extend(entries)
+        self._duplicate_candidates = {}
+        for rule_index, by_size in merged_candidates.items():
+            ordered_sizes = sorted(by_size.items(), key=lambda item: min(entry[2] for entry in item[1]))
+            self._duplicate_candidates[rule_index] = {
+                size: [(path, user_level) for path, user_level, _ in sorted(entries, key=lambda entry: entry[2])]
+                for size, entries in ordered_sizes
+            }
+        block_digests = {}
+        content_digests = {}
+        for partial in partials:
+            for path, digests in partial['content_digests'].items():
+                block_digest, content_digest = (bytes.fromhex(digest) if digest is not None else None for digest in digests)
+                block_digests[path] = block_digest
+                content_digests[path] = content_digest
+        self.report_duplicate_content(block_digests, content_digests)
+        return self.results
+
+    def display_results(self):
+        """在结果区域显示检查结果"""
+        self.result_text.delete(1.0, tk.END)
+        self.result_text.insert(tk.END, self.format_results())
+
+    def export_baseline(self):
+        """将当前所有问题（包括已被基线忽略的）导出为基线文件"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON 文件", "*.json"), ("所有文件", "*.*")],
+            title="导出基线"
+        )
+        if file_path:
+            try:
+                keys = {self.result_key(result) for result in self.results} | self._baseline_seen
+                baseline_data = {
+                    'root': self._check_root,
+                    'entries': [list(key) for key in sorted(keys)]
+                }
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    json.dump(baseline_data, f, ensure_ascii=False)
+                messagebox.showinfo("成功", f"基线已导出（{len(keys)} 个问题）：\n{file_path}")
+            except Exception as e:
+                messagebox.showerror("错误", f"导出基线失败：\n{str(e)}")
+
+    def load_baseline_file(self, file_path: str):
+        """读取基线文件，建立哈希索引"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            baseline_data = json.load(f)
+        self.baseline_keys = {tuple(entry) for entry in baseline_data.get('entries', [])}
+        self.baseline_file = file_path
+
+    def load_baseline(self):
+        """加载基线文件"""
+        file_path = filedialog.askopenfilename(
+            filetypes=[("JSON 文件", "*.json"), ("所有文件", "*.*")],
+            title="加载基线"
+        )
+        if file_path:
+            try:
+                self.load_baseline_file(file_path)
+                messagebox.showinfo("成功", f"基线已加载（{len(self.baseline_keys)} 个已知问题）：\n{file_path}")
+            except json.JSONDecodeError as e:
+                messagebox.showerror("错误", f"基线文件格式错误：\n{str(e)}")
+            except Exception as e:
+                messagebox.showerror("错误", f"加载基线失败：\n{str(e)}")
+
+    def clear_baseline(self):
+        """清除已加载的基线"""
+        self.baseline_keys = set()
+        self.baseline_file = None
+        messagebox.showinfo("成功", "基线已清除")
+
+    def save_tree_snapshot(self):
+        """将缓存的目录树保存到磁盘"""
+        if self.tree_snapshot is None:
+            messagebox.showwarning("警告", "还没有缓存的目录树，请先执行一次检查！")
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON 文件", "*.json"), ("所有文件", "*.*")],
+            title="保存目录树"
+        )
+        if file_path:
+            try:
+                self.tree_snapshot.save(file_path)
+                messagebox.showinfo("成功", f"目录树已保存到：\n{file_path}")
+            except Exception as e:
+                messagebox.showerror("错误", f"保存目录树失败：\n{str(e)}")
+
+    def load_tree_snapshot(self):
+        """从磁盘加载目录树，之后对同一根目录的检查直接使用它"""
+        file_path = filedialog.askopenfilename(
+            filetypes=[("JSON 文件", "*.json"), ("所有文件", "*.*")],
+            title="加载目录树"
+        )
+        if file_path:
+            try:
+                self.tree_snapshot = TreeSnapshot.load(file_path)
+                self.root_folder = Path(self.tree_snapshot.root)
+                self.path_var.set(self.tree_snapshot.root)
+                self.skip_hidden_var.set(self.tree_snapshot.skip_hidden)
+                self.symlink_policy_var.set(SYMLINK_POLICIES.get(self.tree_snapshot.symlink_policy, ''))
+                messagebox.showinfo("成功", f"目录树已加载（扫描于 {self.tree_snapshot.scanned_at}）：\n{file_path}")
+            except json.JSONDecodeError as e:
+                messagebox.showerror("错误", f"目录树文件格式错误：\n{str(e)}")
+            except Exception as e:
+                messagebox.showerror("错误", f"加载目录树失败：\n{str(e)}")
+
+    def apply_name_normalization(self, event=None):
+        """按界面选项设置名称规范化方式"""
+        folding_modes = {label: mode for mode, label in NAME_FOLDING_MODES.items()}
+        self.set_name_normalization(self.normalize_nfc_var.get(), folding_modes.get(self.width_folding_var.get(), 'none'))
+
+    def run_check_gui(self, rescan: bool = False):
         """GUI版本的运行检查"""
         self.check_btn.config(state=tk.DISABLED, text="检查中...")
         self.root.update()
         try:
             self.results = []
+            self.skip_hidden = self.skip_hidden_var.get()
+            policy_names = {label: policy for policy, label in SYMLINK_POLICIES.items()}
+            self.symlink_policy = policy_names.get(self.symlink_policy_var.get(), 'follow')
+            self.cache_tree = self.cache_tree_var.get()
+            self.apply_name_normalization()
+            if not self.cache_tree:
+                self.tree_snapshot = None
             if not self.root_folder.exists():
                 self.result_text.delete(1.0, tk.END)
                 self.result_text.insert(1.0, f"❌ 错误：根目录不存在: {self.root_folder}")
                 return
-            self.check_recursive(self.root_folder)
+            self.run_check(self.root_folder, rescan=rescan)
             # 显示结果
-            self.result_text.delete(1.0, tk.END)
-            if not self.results:
-                self.result_text.insert(1.0, "🎉 恭喜！所有文件结构都符合要求。\n")
-                self.result_text.insert(tk.END, "✅ 文件夹结构完全正确，无需修改。")
-            else:
-                self.result_text.insert(1.0, f"❌ 发现 {len(self.results)} 个问题需要修正：\n")
-                for i, result in enumerate(self.results, 1):
-                    self.result_text.insert(tk.END, f"{i}. [{result['type']}]\n")
-                    self.result_text.insert(tk.END, f"   路径: {result['path']}\n")
-                    self.result_text.insert(tk.END, f"   问题: {result['message']}\n")
-                    if 'actual_name' in result:
-                        self.result_text.insert(tk.END, f"   实际名称: {result['actual_name']}\n")
-                    if 'expected' in result:
-                        self.result_text.insert(tk.END, f"   期望模式: {result['expected']}\n")
-                    self.result_text.insert(tk.END, "\n")
+            self.display_results()
             self.save_btn.config(state=tk.NORMAL)
+            self.export_baseline_btn.config(state=tk.NORMAL)
         except Exception as e:
             self.result_text.delete(1.0, tk.END)
             self.result_text.insert(1.0, f"❌ 检查过程中出现错误：\n{str(e)}")
@@ -774,11 +3127,7 @@ class FileStructureChecker:
         if file_path:
             try:
                 # 准备要保存的数据
-                preset_data = {
-                    'custom_lists': self.custom_lists,
-                    'folder_rules': self.folder_rules,
-                    'file_rules': self.file_rules
-                }
+                preset_data = self.preset_data()
                 # 写入文件
                 with open(file_path, 'w', encoding='utf-8') as f:
                     json.dump(preset_data, f, ensure_ascii=False, indent=4)
@@ -786,6 +3135,32 @@ class FileStructureChecker:
             except Exception as e:
                 messagebox.showerror("错误", f"保存预设失败：\n{str(e)}")
 
+    def preset_data(self) -> dict:
+        """当前配置（自定义列表和全部规则），即预设文件的内容"""
+        return {
+            'custom_lists': self.custom_lists,
+            'folder_rules': self.folder_rules,
+            'file_rules': self.file_rules,
+            'constraint_rules': self.constraint_rules
+        }
+
+    def apply_preset(self, preset_data: dict):
+        """应用预设内容；内容有误时抛出 ValueError，当前配置保持不变"""
+        # 先完整校验和转换，全部通过后再一起替换
+        custom_lists, folder_rules, file_rules, constraint_rules = parse_preset(preset_data)
+        self.custom_lists = custom_lists
+        self.folder_rules = folder_rules
+        self.file_rules = file_rules
+        self.constraint_rules = constraint_rules
+        self.invalidate_rule_caches()
+
+    def load_preset_file(self, file_path: str):
+        """从预设文件读取并应用配置"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            preset_data = json.load(f)
+        self.apply_preset(preset_data)
+        self.preset_name = Path(file_path).stem
+
     def load_preset(self):
         """从文件加载预设配置"""
         file_path = filedialog.askopenfilename(
@@ -795,18 +3170,12 @@ class FileStructureChecker:
         if file_path:
             try:
                 # 从文件读取数据
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    preset_data = json.load(f)
-                # 更新内存中的数据结构
-                # 注意：直接赋值引用可能导致问题，最好进行深拷贝或确保数据结构正确
-                # 这里假设 JSON 数据结构与程序内部完全一致
-                self.custom_lists = preset_data.get('custom_lists', {})
-                self.folder_rules = {int(k): v for k, v in preset_data.get('folder_rules', {}).items()} # 确保键是整数
-                self.file_rules = {int(k): v for k, v in preset_data.get('file_rules', {}).items()} # 确保键是整数
+                self.load_preset_file(file_path)
                 # 更新 GUI 显示
                 self.update_lists_display()
                 self.update_folder_rules_list()
                 self.update_file_rules_list()
+                self.update_constraint_rules_list()
                 # 清空列表项显示，因为列表可能已更改
                 self.list_items_listbox.delete(0, tk.END)
                 messagebox.showinfo("成功", f"预设已从以下位置加载：\n{file_path}")
@@ -815,21 +3184,181 @@ class FileStructureChecker:
             except Exception as e:
                 messagebox.showerror("错误", f"加载预设失败：\n{str(e)}")
 
+    def add_extra_preset(self):
+        """选择同时检查的预设文件"""
+        file_paths = filedialog.askopenfilenames(
+            filetypes=[("JSON 文件", "*.json"), ("所有文件", "*.*")],
+            title="同时检查预设"
+        )
+        for file_path in file_paths:
+            try:
+                self.add_preset_file(file_path)
+            except json.JSONDecodeError as e:
+                messagebox.showerror("错误", f"预设文件格式错误：\n{file_path}\n{str(e)}")
+            except Exception as e:
+                messagebox.showerror("错误", f"加载预设失败：\n{file_path}\n{str(e)}")
+        self.update_extra_presets_label()
+
+    def clear_extra_presets(self):
+        """不再同时检查其它预设"""
+        self.preset_checkers.clear()
+        self.update_extra_presets_label()
+
+    def update_extra_presets_label(self):
+        """显示同时检查的预设名称"""
+        if self.preset_checkers:
+            self.extra_presets_var.set("同时检查：" + "、".join(self.preset_checkers))
+        else:
+            self.extra_presets_var.set("")
+
     def run(self):
         """运行GUI"""
         # 绑定列表选择事件
         self.lists_listbox.bind('<<ListboxSelect>>', self.on_list_selected)
         self.root.mainloop()
 
+class PatternPreview:
+    """
+    规则对话框中的实时预览 - 后台抽样所选层级的真实名称，
+    命名模式修改后防抖，并在后台线程中匹配，不阻塞输入
+    """
+    def __init__(self, parent_frame, dialog, checker, rule_type: str, level_var, pattern_var, ext_var=None):
+        self.dialog = dialog
+        self.checker = checker
+        self.rule_type = rule_type
+        self.root_folder = checker.root_folder
+        self.level_var = level_var
+        self.pattern_var = pattern_var
+        self.ext_var = ext_var
+        self._samples = {}              # {层级: 抽样名称列表}
+        self._sample_lock = threading.Lock()
+        self._results = queue.Queue()   # 后台线程 -> Tk 线程
+        self._generation = 0            # 只显示最新一次匹配的结果
+        self._after_id = None
+        self.frame = ttk.LabelFrame(parent_frame, text="实时预览", padding="10")
+        self.summary_var = tk.StringVar(value="正在抽样...")
+        ttk.Label(self.frame, textvariable=self.summary_var).pack(anchor=tk.W)
+        self.preview_listbox = tk.Listbox(self.frame, height=6)
+        self.preview_listbox.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+        for var in (level_var, pattern_var, ext_var):
+            if var is not None:
+                var.trace_add('write', self.schedule)
+        self.dialog.after(PREVIEW_POLL_MS, self.poll)
+        self.schedule()
+
+    def schedule(self, *args):
+        """输入变化后防抖，停止输入一段时间后才开始匹配"""
+        if self._after_id is not None:
+            self.dialog.after_cancel(self._after_id)
+        self._after_id = self.dialog.after(PREVIEW_DEBOUNCE_MS, self.start)
+
+    def start(self):
+        """在后台线程中抽样并匹配"""
+        self._after_id = None
+        try:
+            level = int(self.level_var.get())
+        except ValueError:
+            self.summary_var.set("层级必须是数字")
+            return
+        if level < 1:
+            self.summary_var.set("层级必须大于等于1")
+            return
+        pattern = self.pattern_var.get().strip()
+        extensions = []
+        if self.ext_var is not None:
+            extensions = [ext.strip().lower() for ext in self.ext_var.get().split(',') if ext.strip()]
+        self._generation += 1
+        worker = threading.Thread(target=self.evaluate, args=(self._generation, level, pattern, extensions), daemon=True)
+        worker.start()
+
+    def evaluate(self, generation: int, level: int, pattern: str, extensions: List[str]):
+        """后台线程：抽样名称并逐个匹配，结果放入队列"""
+        try:
+            with self._sample_lock:
+                if level not in self._samples:
+                    self._samples[level] = self.checker.sample_level_names(self.root_folder, self.rule_type, level)
+                names = self._samples[level]
+            if not names:
+                self._results.put((generation, f"第 {level} 层没有可预览的名称", []))
+                return
+            if not pattern:
+                self._results.put((generation, f"已抽样 {len(names)} 个名称，请输入命名模式", [f"   {name}" for name in names]))
+                return
+            keys = [Path(name).stem for name in names] if self.rule_type == "file" else names
+            # 与检查时一样先规范化名称（列表项已按相同方式规范化）
+            normalize = self.checker.name_normalizer.normalize_uncached
+            keys = [normalize(key) for key in keys]
+            # 不使用检查器的共享缓存，避免与界面线程互相干扰
+            compiled = self.checker.compile_name_pattern(pattern)
+            if compiled.risks:
+                # re 匹配期间不释放 GIL，有回溯风险的模式在这里匹配会卡住界面，只提示风险
+                self._results.put((generation, f"模式有回溯风险，不做预览：{compiled.risks[0]}", [f"   {name}" for name in names]))
+                return
+            passed, _ = compiled.match_many(keys)
+            rows = []
+            for index, name in enumerate(names):
+                mark = "✅" if passed[index] else "❌"
+                if extensions and Path(name).suffix.lower() not in extensions:
+                    mark = "❌"
+                    name = f"{name}（扩展名不符）"
+                rows.append(f"{mark} {name}")
+            matched = sum(1 for row in rows if row.startswith("✅"))
+            self._results.put((generation, f"抽样 {len(names)} 个名称，匹配 {matched} 个，不匹配 {len(names) - matched} 个", rows))
+        except Exception as e:
+            self._results.put((generation, f"模式错误: {e}", []))
+
+    def poll(self):
+        """Tk 线程：取回后台结果并刷新显示"""
+        try:
+            while True:
+                generation, summary, rows = self._results.get_nowait()
+                if generation == self._generation:
+                    self.summary_var.set(summary)
+                    self.preview_listbox.delete(0, tk.END)
+                    for row in rows:
+                        self.preview_listbox.insert(tk.END, row)
+        except queue.Empty:
+            pass
+        try:
+            self.dialog.after(PREVIEW_POLL_MS, self.poll)
+        except tk.TclError:
+            pass  # 对话框已关闭
+
+def review_pattern_safety(parent, checker, pattern: str) -> Optional[str]:
+    """保存规则前检查命名模式的回溯风险，返回最终采用的模式，用户选择返回修改时返回 None"""
+    risks, suggestion = checker.analyze_pattern_safety(pattern)
+    if not risks:
+        return pattern
+    details = '\n'.join(f"· {risk}" for risk in risks)
+    if suggestion is not None:
+        answer = messagebox.askyesnocancel(
+            "回溯风险",
+            f"该模式遇到较长的名称时可能匹配得很慢：\n{details}\n\n"
+            f"等价的写法：{suggestion}\n\n"
+            "是：使用等价的写法\n否：保留原模式\n取消：返回修改",
+            parent=parent)
+        if answer is None:
+            return None
+        return suggestion if answer else pattern
+    if messagebox.askyesno(
+            "回溯风险",
+            f"该模式遇到较长的名称时可能匹配得很慢：\n{details}\n\n"
+            f"没有找到等价的安全写法。检查时单个名称匹配超过 {checker.match_time_limit:g} 秒会报告为“匹配超时”。\n"
+            "仍要保存吗？",
+            parent=parent):
+        return pattern
+    return None
+
 class RuleDialog:
     """规则设定对话框"""
-    def __init__(self, parent, title: str, rule_type: str, available_lists: List[str]):
+    def __init__(self, parent, title: str, rule_type: str, available_lists: List[str], checker=None):
         self.result = None
         self.rule_type = rule_type
         self.available_lists = available_lists
+        self.checker = checker
         self.dialog = tk.Toplevel(parent)
         self.dialog.title(title)
-        self.dialog.geometry("600x600")
+        self.dialog.geometry("600x900" if checker else "600x700")
         self.dialog.transient(parent)
         self.dialog.grab_set()
         # 居中显示
@@ -848,6 +3377,19 @@ class RuleDialog:
         level_entry = ttk.Entry(level_frame, textvariable=self.level_var, width=10)
         level_entry.pack(side=tk.LEFT, padx=(10, 0))
         ttk.Label(level_frame, text="(1表示根目录下第一层，2表示第二层……)").pack(side=tk.LEFT, padx=(10, 0))
+        # 作用范围
+        scope_frame = ttk.LabelFrame(main_frame, text="作用范围（可选）", padding="10")
+        scope_frame.pack(fill=tk.X, pady=(0, 10))
+        scope_frame.columnconfigure(1, weight=1)
+        ttk.Label(scope_frame, text="所在路径:").grid(row=0, column=0, sticky=tk.W)
+        self.scope_var = tk.StringVar()
+        scope_entry = ttk.Entry(scope_frame, textvariable=self.scope_var)
+        scope_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(10, 0))
+        ttk.Label(scope_frame, text="上级列表值:").grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        self.scope_values_var = tk.StringVar()
+        scope_values_entry = ttk.Entry(scope_frame, textvariable=self.scope_values_var)
+        scope_values_entry.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=(5, 0))
+        ttk.Label(scope_frame, text="(所在路径相对于检查根目录，可用 * 和 **，如: 语文组/*；上级列表值如: 学科=语文；留空表示不限)").grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
         # 命名模式
         pattern_frame = ttk.Frame(main_frame)
         pattern_frame.pack(fill=tk.X, pady=(0, 10))
@@ -884,6 +3426,11 @@ class RuleDialog:
             self.ext_var = tk.StringVar()
             ext_entry = ttk.Entry(ext_frame, textvariable=self.ext_var)
             ext_entry.pack(fill=tk.X, pady=(5, 0))
+        # 实时预览（抽样所选层级的真实名称）
+        if self.checker is not None:
+            self.preview = PatternPreview(main_frame, self.dialog, self.checker, self.rule_type,
+                                          self.level_var, self.pattern_var, getattr(self, 'ext_var', None))
+            self.preview.frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         # 常用模式说明
         help_frame = ttk.LabelFrame(main_frame, text="使用说明", padding="10")
         help_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
@@ -896,6 +3443,8 @@ class RuleDialog:
         自定义列表使用：[列表名]
         例如：[年级] 将匹配你创建的年级列表中的任意一项
         列表匹配：勾选列表名后，会检查当前文件/文件夹中的列表值是否与上级文件夹相同
+        同一层可添加多条规则：名称符合其中任意一条即可，按顺序匹配；文件优先匹配扩展名相符的规则
+        作用范围：只在所在路径符合通配符、且上级列表值相同的位置使用该规则
         预定义模式：
         [年份4位]  →  \\d{4}
         [数字]  →  \\d+
@@ -926,10 +3475,21 @@ class RuleDialog:
             if not pattern:
                 messagebox.showerror("错误", "请填写命名模式！")
                 return
+            if self.checker is not None:
+                pattern = review_pattern_safety(self.dialog, self.checker, pattern)
+                if pattern is None:
+                    return
+            try:
+                scope_values = parse_scope_values(self.scope_values_var.get())
+            except ValueError:
+                messagebox.showerror("错误", "上级列表值的格式应为 列表名=值，多个用逗号分隔！")
+                return
             self.result = {
                 'level': level,
                 'pattern': pattern,
-                'description': description
+                'description': description,
+                'scope': self.scope_var.get().strip(),
+                'scope_values': scope_values
             }
             # 处理列表匹配设置
             list_matching = {}
@@ -950,14 +3510,15 @@ class RuleDialog:
 
 class EditRuleDialog:
     """编辑规则对话框"""
-    def __init__(self, parent, title: str, rule_type: str, available_lists: List[str], level: int, existing_rule: dict):
+    def __init__(self, parent, title: str, rule_type: str, available_lists: List[str], level: int, existing_rule: dict, checker=None):
         self.result = None
         self.rule_type = rule_type
         self.available_lists = available_lists
         self.existing_rule = existing_rule
+        self.checker = checker
         self.dialog = tk.Toplevel(parent)
         self.dialog.title(title)
-        self.dialog.geometry("600x600")
+        self.dialog.geometry("600x900" if checker else "600x700")
         self.dialog.transient(parent)
         self.dialog.grab_set()
         # 居中显示
@@ -976,6 +3537,19 @@ class EditRuleDialog:
         level_entry = ttk.Entry(level_frame, textvariable=self.level_var, width=10)
         level_entry.pack(side=tk.LEFT, padx=(10, 0))
         ttk.Label(level_frame, text="(1表示根目录下第一层，2表示第二层……)").pack(side=tk.LEFT, padx=(10, 0))
+        # 作用范围
+        scope_frame = ttk.LabelFrame(main_frame, text="作用范围（可选）", padding="10")
+        scope_frame.pack(fill=tk.X, pady=(0, 10))
+        scope_frame.columnconfigure(1, weight=1)
+        ttk.Label(scope_frame, text="所在路径:").grid(row=0, column=0, sticky=tk.W)
+        self.scope_var = tk.StringVar(value=self.existing_rule.get('scope', ''))
+        scope_entry = ttk.Entry(scope_frame, textvariable=self.scope_var)
+        scope_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(10, 0))
+        ttk.Label(scope_frame, text="上级列表值:").grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        self.scope_values_var = tk.StringVar(value=format_scope_values(self.existing_rule.get('scope_values', {})))
+        scope_values_entry = ttk.Entry(scope_frame, textvariable=self.scope_values_var)
+        scope_values_entry.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=(5, 0))
+        ttk.Label(scope_frame, text="(所在路径相对于检查根目录，可用 * 和 **，如: 语文组/*；上级列表值如: 学科=语文；留空表示不限)").grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
         # 命名模式
         pattern_frame = ttk.Frame(main_frame)
         pattern_frame.pack(fill=tk.X, pady=(0, 10))
@@ -1014,6 +3588,11 @@ class EditRuleDialog:
             self.ext_var = tk.StringVar(value=ext_str)
             ext_entry = ttk.Entry(ext_frame, textvariable=self.ext_var)
             ext_entry.pack(fill=tk.X, pady=(5, 0))
+        # 实时预览（抽样所选层级的真实名称）
+        if self.checker is not None:
+            self.preview = PatternPreview(main_frame, self.dialog, self.checker, self.rule_type,
+                                          self.level_var, self.pattern_var, getattr(self, 'ext_var', None))
+            self.preview.frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         # 常用模式说明
         help_frame = ttk.LabelFrame(main_frame, text="使用说明", padding="10")
         help_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
@@ -1026,6 +3605,8 @@ class EditRuleDialog:
         自定义列表使用：[列表名]
         例如：[年级] 将匹配你创建的年级列表中的任意一项
         列表匹配：勾选列表名后，会检查当前文件/文件夹中的列表值是否与上级文件夹相同
+        同一层可添加多条规则：名称符合其中任意一条即可，按顺序匹配；文件优先匹配扩展名相符的规则
+        作用范围：只在所在路径符合通配符、且上级列表值相同的位置使用该规则
         预定义模式：
         [年份4位]  →  \\d{4}
         [数字]  →  \\d+
@@ -1056,10 +3637,21 @@ class EditRuleDialog:
             if not pattern:
                 messagebox.showerror("错误", "请填写命名模式！")
                 return
+            if self.checker is not None:
+                pattern = review_pattern_safety(self.dialog, self.checker, pattern)
+                if pattern is None:
+                    return
+            try:
+                scope_values = parse_scope_values(self.scope_values_var.get())
+            except ValueError:
+                messagebox.showerror("错误", "上级列表值的格式应为 列表名=值，多个用逗号分隔！")
+                return
             self.result = {
                 'level': level,
                 'pattern': pattern,
-                'description': description
+                'description': description,
+                'scope': self.scope_var.get().strip(),
+                'scope_values': scope_values
             }
             # 处理列表匹配设置
             list_matching = {}
@@ -1078,8 +3670,394 @@ class EditRuleDialog:
         """取消按钮处理"""
         self.dialog.destroy()
 
+class ConstraintRuleDialog:
+    """约束规则对话框（唯一性规则 / 覆盖规则 / 文件大小规则 / 重复内容规则）"""
+    def __init__(self, parent, title: str, rule_type: str, available_lists: List[str]):
+        self.result = None
+        self.rule_type = rule_type
+        self.available_lists = available_lists
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title(title)
+        self.dialog.geometry("520x320")
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+        # 居中显示
+        self.dialog.geometry("+%d+%d" % (parent.winfo_rootx()+50, parent.winfo_rooty()+50))
+        self.setup_dialog()
+
+    def setup_dialog(self):
+        """设置对话框界面"""
+        main_frame = ttk.Frame(self.dialog, padding="20")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        # 检查对象（内容规则只检查文件）
+        self.target_var = tk.StringVar(value="文件夹" if self.rule_type in ("unique", "coverage") else "文件")
+        if self.rule_type in ("unique", "coverage"):
+            target_frame = ttk.Frame(main_frame)
+            target_frame.pack(fill=tk.X, pady=(0, 10))
+            ttk.Label(target_frame, text="检查对象:").pack(side=tk.LEFT)
+            target_combo = ttk.Combobox(target_frame, textvariable=self.target_var, values=["文件夹", "文件"], state="readonly", width=10)
+            target_combo.pack(side=tk.LEFT, padx=(10, 0))
+        # 层级
+        level_frame = ttk.Frame(main_frame)
+        level_frame.pack(fill=tk.X, pady=(0, 10))
+        ttk.Label(level_frame, text="层级:").pack(side=tk.LEFT)
+        self.level_var = tk.StringVar()
+        level_entry = ttk.Entry(level_frame, textvariable=self.level_var, width=10)
+        level_entry.pack(side=tk.LEFT, padx=(10, 0))
+        if self.rule_type == "unique":
+            ttk.Label(level_frame, text="(留空表示任意层)").pack(side=tk.LEFT, padx=(10, 0))
+            # 不可重复的值
+            key_frame = ttk.Frame(main_frame)
+            key_frame.pack(fill=tk.X, pady=(0, 10))
+            ttk.Label(key_frame, text="不可重复的值:").pack(side=tk.LEFT)
+            self.key_var = tk.StringVar(value="名称")
+            key_combo = ttk.Combobox(key_frame, textvariable=self.key_var, values=["名称"] + self.available_lists, state="readonly", width=15)
+            key_combo.pack(side=tk.LEFT, padx=(10, 0))
+            ttk.Label(key_frame, text="(名称忽略大小写，文件不含扩展名)").pack(side=tk.LEFT, padx=(10, 0))
+            # 范围
+            scope_frame = ttk.Frame(main_frame)
+            scope_frame.pack(fill=tk.X, pady=(0, 10))
+            ttk.Label(scope_frame, text="范围层级:").pack(side=tk.LEFT)
+            self.scope_var = tk.StringVar()
+            scope_entry = ttk.Entry(scope_frame, textvariable=self.scope_var, width=10)
+            scope_entry.pack(side=tk.LEFT, padx=(10, 0))
+            ttk.Label(scope_frame, text="(在每个该层文件夹内不重复，留空表示整个目录树)").pack(side=tk.LEFT, padx=(10, 0))
+        elif self.rule_type in ("size", "duplicate"):
+            ttk.Label(level_frame, text="(留空表示任意层)").pack(side=tk.LEFT, padx=(10, 0))
+            self.key_var = tk.StringVar()
+            # 文件大小
+            self.min_size_var = tk.StringVar(value="1B" if self.rule_type == "duplicate" else "")
+            self.max_size_var = tk.StringVar()
+            size_frame = ttk.Frame(main_frame)
+            size_frame.pack(fill=tk.X, pady=(0, 10))
+            ttk.Label(size_frame, text="最小:" if self.rule_type == "size" else "忽略小于:").pack(side=tk.LEFT)
+            min_size_entry = ttk.Entry(size_frame, textvariable=self.min_size_var, width=10)
+            min_size_entry.pack(side=tk.LEFT, padx=(10, 0))
+            if self.rule_type == "size":
+                ttk.Label(size_frame, text="最大:").pack(side=tk.LEFT, padx=(10, 0))
+                max_size_entry = ttk.Entry(size_frame, textvariable=self.max_size_var, width=10)
+                max_size_entry.pack(side=tk.LEFT, padx=(10, 0))
+                ttk.Label(main_frame, text="(如 1B、500KB、2GB，留空表示不限；最小填 1B 可找出空文件)").pack(anchor=tk.W, pady=(0, 10))
+            else:
+                ttk.Label(size_frame, text="的文件").pack(side=tk.LEFT, padx=(5, 0))
+                ttk.Label(main_frame, text="(先按大小分组，只有大小和开头结尾都相同的文件才会完整读取比较)").pack(anchor=tk.W, pady=(0, 10))
+        else:
+            # 必须全部出现的列表
+            key_frame = ttk.Frame(main_frame)
+            key_frame.pack(fill=tk.X, pady=(0, 10))
+            ttk.Label(key_frame, text="必须全部出现的列表:").pack(side=tk.LEFT)
+            self.key_var = tk.StringVar(value=self.available_lists[0] if self.available_lists else "")
+            key_combo = ttk.Combobox(key_frame, textvariable=self.key_var, values=self.available_lists, state="readonly", width=15)
+            key_combo.pack(side=tk.LEFT, padx=(10, 0))
+            ttk.Label(main_frame, text="(每个上一层文件夹下，列表的每一项都要有对应的该层文件夹/文件)").pack(anchor=tk.W, pady=(0, 10))
+        # 描述
+        desc_frame = ttk.Frame(main_frame)
+        desc_frame.pack(fill=tk.X, pady=(0, 10))
+        ttk.Label(desc_frame, text="规则描述:").pack(anchor=tk.W)
+        self.desc_var = tk.StringVar()
+        desc_entry = ttk.Entry(desc_frame, textvariable=self.desc_var)
+        desc_entry.pack(fill=tk.X, pady=(5, 0))
+        # 按钮
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill=tk.X)
+        ok_btn = ttk.Button(button_frame, text="确定", command=self.ok)
+        ok_btn.pack(side=tk.RIGHT, padx=(10, 0))
+        cancel_btn = ttk.Button(button_frame, text="取消", command=self.cancel)
+        cancel_btn.pack(side=tk.RIGHT)
+
+    def parse_level(self, text: str) -> Optional[int]:
+        """把用户层级转换为内部层级，留空返回 None"""
+        text = text.strip()
+        if not text:
+            return None
+        level = int(text)
+        if level < 1:
+            raise ValueError(text)
+        return level - 1
+
+    def ok(self):
+        """确定按钮处理"""
+        try:
+            level = self.parse_level(self.level_var.get())
+            scope_level = self.parse_level(self.scope_var.get()) if self.rule_type == "unique" else None
+        except ValueError:
+            messagebox.showerror("错误", "层级必须是大于等于1的数字！")
+            return
+        if self.rule_type in ("size", "duplicate"):
+            try:
+                min_size = parse_size(self.min_size_var.get())
+                max_size = parse_size(self.max_size_var.get())
+            except ValueError:
+                messagebox.showerror("错误", "大小的格式应为数字加单位，如 500KB、2GB！")
+                return
+            if self.rule_type == "size" and min_size is None and max_size is None:
+                messagebox.showerror("错误", "请至少填写最小或最大大小！")
+                return
+        key = self.key_var.get()
+        self.result = {
+            'type': self.rule_type,
+            'target': 'folder' if self.target_var.get() == "文件夹" else 'file',
+            'level': level,
+            'key': '' if key == "名称" else key,
+            'description': self.desc_var.get().strip()
+        }
+        if self.rule_type == "unique":
+            self.result['scope_level'] = scope_level
+        elif self.rule_type == "size":
+            self.result['min_size'] = min_size
+            self.result['max_size'] = max_size
+        elif self.rule_type == "duplicate":
+            self.result['min_size'] = min_size if min_size is not None else 0
+        else:
+            if level is None:
+                messagebox.showerror("错误", "覆盖规则必须填写层级！")
+                self.result = None
+                return
+            if not key:
+                messagebox.showerror("错误", "请选择列表！")
+                self.result = None
+                return
+        self.dialog.destroy()
+
+    def cancel(self):
+        """取消按钮处理"""
+        self.dialog.destroy()
+
+# 常驻服务默认监听的本机地址和端口
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+
+class CheckService:
+    """
+    常驻检查服务 - 预设、编译好的规则和目录树缓存常驻内存，预设文件修改后自动重新加载
+    """
+    def __init__(self, checker: 'FileStructureChecker', preset_path: str, default_root: Optional[str] = None):
+        self.checker = checker
+        self.preset_path = preset_path
+        self.default_root = default_root
+        self.preset_mtime = None   # 已加载预设文件的修改时间
+        self.loaded_at = None      # 预设加载时间
+        self.preset_error = None   # 最近一次重新加载失败的原因，成功后清空
+        self.reload_preset(force=True)
+
+    def reload_preset(self, force: bool = False) -> bool:
+        """预设文件有变化时重新加载并预先编译规则，返回是否重新加载；文件有误时抛出异常，原有规则保持不变"""
+        mtime = os.stat(self.preset_path).st_mtime_ns
+        if not force and mtime == self.preset_mtime:
+            return False
+        self.checker.load_preset_file(self.preset_path)
+        self.preset_mtime = mtime
+        self.loaded_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.preset_error = None
+        self.warm_rules()
+        return True
+
+    def warm_rules(self):
+        """预先编译各层的命名模式和合并匹配器，第一个请求不必等待编译"""
+        checker = self.checker
+        for rules in (checker.folder_rules, checker.file_rules):
+            for level in rules:
+                patterns = tuple(rule['pattern'] for rule in level_rules(rules, level) if rule['pattern'])
+                if patterns:
+                    checker.get_rule_matcher(patterns)
+
+    def status(self) -> dict:
+        """服务状态"""
+        snapshot = self.checker.tree_snapshot
+        return {
+            'preset': self.preset_path,
+            'preset_loaded_at': self.loaded_at,
+            'preset_error': self.preset_error,
+            'cache_tree': self.checker.cache_tree,
+            'cached_root': snapshot.root if snapshot is not None else None,
+            'cached_dirs': len(snapshot.dirs) if snapshot is not None else 0,
+            'options': self.checker.check_options(),
+            'match_cache': self.checker.match_cache.stats()
+        }
+
+    def check(self, request: dict) -> dict:
+        """执行一次检查请求 {'root': 根目录, 'path': 只检查该路径（可选）, 'rescan': 是否重新扫描整个目录树}
+
+        指定 path 时只遍历该路径（先重新读取该路径），上级文件夹的列表值按名称推算；
+        未指定时默认复查缓存的目录树（尚无缓存时扫描磁盘），磁盘内容有变化时请传 rescan: true
+        """
+        try:
+            self.reload_preset()
+        except (OSError, ValueError) as e:
+            self.preset_error = str(e)
+        root = request.get('root') or self.default_root
+        if not root:
+            raise ValueError("请求中缺少 root")
+        root_folder = Path(root)
+        if not root_folder.is_dir():
+            raise ValueError(f"根目录不存在：{root}")
+        target = request.get('path')
+        started = time.perf_counter()
+        checker = self.checker
+        if target:
+            target_path = Path(os.path.normpath(root_folder / target))
+            rel_path = os.path.relpath(target_path, root_folder)
+            if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+                raise ValueError(f"路径不在根目录内：{target}")
+            if not target_path.exists():
+                raise ValueError(f"路径不存在：{target}")
+            # 缓存的目录树中该路径可能已过时（如刚上传完成），重新读取磁盘
+            checker.refresh_tree([target_path])
+            results = checker.run_check(root_folder, rescan=bool(request.get('rescan', False)), target=target_path)
+        else:
+            results = checker.run_check(root_folder, rescan=bool(request.get('rescan', False)))
+        return {
+            'root': str(root_folder),
+            'path': target,
+            'count': len(results),
+            'results': results,
+            'suppressed': checker.suppressed_count,
+            'from_cache': checker.last_check_from_cache,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+            'preset_loaded_at': self.loaded_at,
+            'preset_error': self.preset_error
+        }
+
+class CheckServiceHandler(BaseHTTPRequestHandler):
+    """常驻服务的 HTTP 接口：POST /check、POST /reload、GET /status，请求和响应均为 JSON"""
+
+    def do_GET(self):
+        if self.path == '/status':
+            self.send_json(200, self.server.service.status())
+        else:
+            self.send_json(404, {'error': f"未知的地址：{self.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("请求内容必须是 JSON 对象")
+            if self.path == '/check':
+                self.send_json(200, service.check(request))
+            elif self.path == '/reload':
+                service.reload_preset(force=True)
+                self.send_json(200, service.status())
+            else:
+                self.send_json(404, {'error': f"未知的地址：{self.path}"})
+        except (OSError, ValueError) as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            self.send_json(500, {'error': f"服务内部错误：{type(e).__name__}: {e}"})
+
+    def send_json(self, status: int, body: dict):
+        """发送 JSON 响应"""
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def serve_checker(service: CheckService, host: str = SERVICE_HOST, port: int = SERVICE_PORT):
+    """在本机地址上运行常驻服务，请求逐个处理（检查器不支持并发）"""
+    server = HTTPServer((host, port), CheckServiceHandler)
+    server.service = service
+    print(f"文件结构检查服务已启动：http://{host}:{server.server_port}（预设 {service.preset_path}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.checker.match_guard.close()
+
+def add_check_option_arguments(parser: argparse.ArgumentParser):
+    """影响检查结果的遍历和名称规范化选项（与 check_options 对应）"""
+    parser.add_argument('--skip-hidden', action='store_true', help="跳过隐藏/系统文件")
+    parser.add_argument('--symlinks', choices=list(SYMLINK_POLICIES), default='follow', help="符号链接遍历策略")
+    parser.add_argument('--nfc', action='store_true', help="统一Unicode编码(NFC)")
+    parser.add_argument('--width-folding', choices=list(NAME_FOLDING_MODES), default='none', help="全角转半角")
+    parser.add_argument('--match-time-limit', type=float, default=MATCH_TIME_LIMIT,
+                        help="有回溯风险的模式匹配单个名称的时限（秒）")
+    parser.add_argument('--match-cache-size', type=int, default=MATCH_CACHE_SIZE,
+                        help=f"名称匹配结果缓存的容量（条目数，默认 {MATCH_CACHE_SIZE}，0 表示不缓存）")
+
+def apply_check_option_arguments(checker: 'FileStructureChecker', args: argparse.Namespace):
+    """把命令行中的检查选项应用到检查器"""
+    checker.symlink_policy = args.symlinks
+    checker.skip_hidden = args.skip_hidden
+    checker.set_name_normalization(args.nfc, args.width_folding)
+    checker.match_time_limit = args.match_time_limit
+    checker.match_cache.resize(args.match_cache_size)
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """命令行参数（分片检查、合并结果和常驻服务）"""
+    parser = argparse.ArgumentParser(description="文件结构检查工具（不带参数时启动图形界面）")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    shard_parser = subparsers.add_parser('shard', help="分片检查，输出可合并的部分结果文件")
+    shard_parser.add_argument('root', help="要检查的根目录（各分片须使用相同的路径）")
+    shard_parser.add_argument('--preset', required=True, help="预设文件")
+    shard_parser.add_argument('--shard-index', type=int, default=0, help="本分片序号，从 0 开始")
+    shard_parser.add_argument('--shard-count', type=int, default=1, help="分片总数")
+    shard_parser.add_argument('--shard-level', type=int, default=1, help="按第几层文件夹分片（默认 1，即根目录下的文件夹）")
+    add_check_option_arguments(shard_parser)
+    shard_parser.add_argument('-o', '--output', required=True, help="部分结果文件")
+    merge_parser = subparsers.add_parser('merge', help="合并各分片的部分结果，生成完整报告")
+    merge_parser.add_argument('partials', nargs='+', help="各分片的部分结果文件")
+    merge_parser.add_argument('--baseline', help="基线文件，其中的已知问题不再报告")
+    merge_parser.add_argument('-o', '--output', help="报告文件，默认输出到屏幕")
+    serve_parser = subparsers.add_parser('serve', help="常驻服务，通过本机 HTTP 接收检查请求并返回 JSON 结果")
+    serve_parser.add_argument('--preset', required=True, help="预设文件（修改后自动重新加载）")
+    serve_parser.add_argument('--root', help="请求中未指定 root 时检查的根目录")
+    serve_parser.add_argument('--host', default=SERVICE_HOST, help=f"监听地址（默认 {SERVICE_HOST}，仅本机可访问）")
+    serve_parser.add_argument('--port', type=int, default=SERVICE_PORT, help=f"监听端口（默认 {SERVICE_PORT}）")
+    serve_parser.add_argument('--no-cache-tree', action='store_true', help="不缓存目录树（默认缓存，未指定 path 的检查默认直接复查缓存，请求中 rescan 为 true 时重新扫描磁盘）")
+    serve_parser.add_argument('--baseline', help="基线文件，其中的已知问题不再报告")
+    add_check_option_arguments(serve_parser)
+    return parser
+
+def run_cli(argv: List[str]) -> int:
+    """执行命令行命令，返回退出码"""
+    args = build_arg_parser().parse_args(argv)
+    checker = FileStructureChecker(gui=False)
+    checker.cache_tree = False
+    try:
+        if args.command == 'shard':
+            checker.load_preset_file(args.preset)
+            apply_check_option_arguments(checker, args)
+            partial = checker.run_shard(Path(args.root), args.shard_index, args.shard_count, args.shard_level)
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(partial, f, ensure_ascii=False)
+            print(f"分片 {args.shard_index}/{args.shard_count}：发现 {len(partial['results'])} 个问题，部分结果已写入 {args.output}")
+        elif args.command == 'serve':
+            apply_check_option_arguments(checker, args)
+            checker.cache_tree = not args.no_cache_tree
+            if args.baseline:
+                checker.load_baseline_file(args.baseline)
+            serve_checker(CheckService(checker, args.preset, args.root), args.host, args.port)
+        else:
+            partials = []
+            for file_path in args.partials:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    partials.append(json.load(f))
+            if args.baseline:
+                checker.load_baseline_file(args.baseline)
+            checker.merge_shard_results(partials)
+            report = checker.format_results()
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    f.write(report)
+                print(f"已合并 {len(partials)} 个分片，发现 {len(checker.results)} 个问题，报告已写入 {args.output}")
+            else:
+                print(report)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return 1
+    return 0
+
 def main():
-    """主函数"""
+    """主函数（带参数时执行命令行命令）"""
+    # 打包为可执行文件时限时匹配的子进程需要
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
     print("正在启动文件结构检查工具...")
     app = FileStructureChecker()
     app.run()
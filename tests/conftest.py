@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import FileChecker  # noqa: E402
+
+
+@pytest.fixture
+def checker():
+    """不带界面的检查器，检查结束后关闭匹配子进程"""
+    instance = FileChecker.FileStructureChecker(gui=False)
+    yield instance
+    instance.match_guard.close()
+
+
+@pytest.fixture
+def make_tree(tmp_path):
+    """按 {相对路径: 内容} 建立目录树，路径以 / 结尾表示文件夹，返回根目录"""
+    def build(entries, root=None):
+        root = root or tmp_path / 'root'
+        root.mkdir(parents=True, exist_ok=True)
+        for rel_path, content in entries.items():
+            path = root / rel_path
+            if rel_path.endswith('/'):
+                path.mkdir(parents=True, exist_ok=True)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(content.encode('utf-8') if isinstance(content, str) else content)
+        return root
+    return build
@@ -0,0 +1,28 @@
+import FileChecker
+from FileChecker import MATCH_TIMEOUT, find_backtracking_risks
+
+
+def test_ambiguous_alternation_in_repeat_is_risky():
+    assert find_backtracking_risks(r'^(a|aa)+b$')
+    assert find_backtracking_risks(r'^(a|ab)*c$')
+    assert find_backtracking_risks(r'^(?:x|)+y$')
+
+
+def test_distinct_alternation_is_not_risky():
+    assert not find_backtracking_risks(r'^(jpg|png)+$')
+    assert not find_backtracking_risks(r'^((一年级|二年级)_)+$')
+    assert not find_backtracking_risks(r'^(x|xy)$')
+
+
+def test_ambiguous_alternation_goes_through_match_guard(checker):
+    checker.match_time_limit = 0.5
+    pattern = r'(a|aa)+b'
+    assert checker.get_rule_matcher((pattern,)).risky
+    positions, _ = checker.classify_names_batch(['a' * 60, 'aab', 'c'], (pattern,))
+    assert positions == [MATCH_TIMEOUT, 0, -1]
+
+
+def test_conditional_group_reference_is_not_combined(checker):
+    compiled = [checker.get_compiled_pattern(pattern)
+                for pattern in (r'(a)?(?(1)b|c)', r'x')]
+    assert FileChecker.RuleMatcher(compiled).regex is None
@@ -0,0 +1,28 @@
+import json
+
+NAMING_RULE = {'pattern': r'第\d+课', 'description': '', 'list_matching': {}}
+
+
+def test_baseline_suppresses_known_problems(checker, make_tree, tmp_path):
+    root = make_tree({'第1课/': '', '草稿/': '', '旧资料/': ''})
+    checker.folder_rules = {0: [NAMING_RULE]}
+    known = checker.run_check(root)
+    assert len(known) == 2
+    baseline_file = tmp_path / 'baseline.json'
+    baseline_file.write_text(json.dumps({'root': str(root), 'entries': [list(checker.result_key(result)) for result in known]}))
+    checker.load_baseline_file(str(baseline_file))
+
+    (root / '新建文件夹').mkdir()
+    (root / '旧资料').rename(root / '第2课')
+    results = checker.run_check(root, rescan=True)
+    assert [result['actual_name'] for result in results] == ['新建文件夹']
+    assert checker.suppressed_count == 1
+    assert checker.resolved_baseline_keys() == [('文件夹命名错误', '旧资料', NAMING_RULE['pattern'])]
+
+
+def test_baseline_keys_do_not_depend_on_the_root_location(checker, make_tree, tmp_path):
+    checker.folder_rules = {0: [NAMING_RULE]}
+    first = make_tree({'草稿/': ''}, tmp_path / 'first')
+    keys = [checker.result_key(result) for result in checker.run_check(first)]
+    second = make_tree({'草稿/': ''}, tmp_path / 'second')
+    assert [checker.result_key(result) for result in checker.run_check(second)] == keys
@@ -0,0 +1,29 @@
+import os
+
+from FileChecker import CONTENT_HASH_BLOCK_SIZE
+
+
+def problems(results, root, problem_type):
+    return sorted(os.path.relpath(result['path'], root) for result in results if result['type'] == problem_type)
+
+
+def test_size_limits(checker, make_tree):
+    root = make_tree({'空.txt': '', '小.txt': 'x' * 10, '大.txt': 'x' * 2000, 'A/大.txt': 'x' * 2000})
+    checker.constraint_rules = [
+        {'type': 'size', 'target': 'file', 'level': None, 'min_size': 1, 'max_size': None, 'description': ''},
+        {'type': 'size', 'target': 'file', 'level': 0, 'min_size': None, 'max_size': 1024, 'description': ''},
+    ]
+    assert problems(checker.run_check(root), root, '文件大小错误') == ['大.txt', '空.txt']
+
+
+def test_duplicate_content(checker, make_tree):
+    large = os.urandom(3 * CONTENT_HASH_BLOCK_SIZE)
+    changed = bytearray(large)
+    changed[len(large) // 2] ^= 1  # 开头和末尾相同，只有中间不同
+    root = make_tree({
+        'a.txt': 'hello', 'A/b.txt': 'hello', 'B/c.txt': 'world',
+        'big1.bin': large, 'A/big2.bin': large, 'B/big3.bin': bytes(changed),
+        'empty1.txt': '', 'empty2.txt': '',
+    })
+    checker.constraint_rules = [{'type': 'duplicate', 'target': 'file', 'level': None, 'min_size': 1, 'description': ''}]
+    assert problems(checker.run_check(root), root, '重复内容') == ['A/b.txt', 'A/big2.bin']
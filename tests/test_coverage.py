@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+GRADES = ['一年级', '二年级', '三年级']
+
+
+def coverage_rule(target, level):
+    return {'type': 'coverage', 'target': target, 'key': '年级', 'level': level, 'description': ''}
+
+
+def missing_items(results, root):
+    return {os.path.relpath(result['path'], root): result['message'].split(': ')[1].split(' (')[0]
+            for result in results if result['type'] == '覆盖缺失'}
+
+
+@pytest.fixture
+def grade_checker(checker):
+    checker.custom_lists = {'年级': list(GRADES)}
+    return checker
+
+
+def test_missing_folders_are_reported_per_parent(grade_checker, make_tree):
+    root = make_tree({'A/一年级资料/': '', 'A/三年级资料/': '', 'B/一年级/': '', 'B/二年级/': '', 'B/三年级/': '', 'C/': ''})
+    grade_checker.constraint_rules = [coverage_rule('folder', 1)]
+    assert missing_items(grade_checker.run_check(root), root) == {'A': '二年级', 'C': '一年级, 二年级, 三年级'}
+
+
+def test_named_rule_values_are_used_for_files(grade_checker, make_tree):
+    # 命名不符合规则的文件不算覆盖了列表项
+    root = make_tree({'一年级课件.pdf': '', '二年级草稿.pdf': '', '三年级课件.pdf': ''})
+    grade_checker.file_rules = {0: [{'pattern': '[年级]课件', 'extensions': ['.pdf'], 'description': '', 'list_matching': {}}]}
+    grade_checker.constraint_rules = [coverage_rule('file', 0)]
+    assert missing_items(grade_checker.run_check(root), root) == {'.': '二年级'}
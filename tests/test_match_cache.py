@@ -0,0 +1,14 @@
+def test_prefiltered_patterns_skip_the_cache(checker):
+    passed, _ = checker.check_names_batch(['课程介绍_20240101', '其他'], r'课程介绍_\d{8}')
+    assert list(passed) == [1, 0]
+    assert checker.match_cache.stats()['size'] == 0
+
+
+def test_risky_patterns_are_cached_once_per_name(checker):
+    pattern = r'(a|aa)+b'
+    positions, _ = checker.classify_names_batch(['aab', 'c', 'aab'], (pattern,))
+    assert positions == [0, -1, 0]
+    assert checker.match_cache.stats()['size'] == 2
+    positions, _ = checker.classify_names_batch(['aab'], (pattern,))
+    assert positions == [0]
+    assert checker.match_cache.stats()['hits'] == 1
@@ -0,0 +1,60 @@
+import itertools
+
+import pytest
+
+from FileChecker import analyze_required_literals
+
+PATTERNS = [
+    r'课程介绍_\d{8}',
+    r'[年级][学科]课件',
+    r'思维[年级]',
+    r'abc.*xyz',
+    r'a(b|c)d',
+    r'x?y',
+    r'.*资料.*',
+    r'[年级]\d班(_备份)?',
+]
+
+NAMES = [
+    '课程介绍_20240101', '课程介绍_2024010', '课程介绍_20240101\n', '一年级语文课件', '三年级数学课件', '五年级语文课件',
+    '思维二年级', '思维', 'abcxyz', 'abc_xyz', 'abxyz', 'abd', 'acd', 'aed', 'y', 'xy', 'xxy', '资料', '语文资料汇总',
+    '一年级3班', '一年级3班_备份', '一年级3班_备', '', '年级',
+]
+
+
+@pytest.fixture
+def list_checker(checker):
+    checker.custom_lists = {'年级': ['一年级', '二年级', '三年级'], '学科': ['语文', '数学']}
+    return checker
+
+
+@pytest.mark.parametrize('source, expected', [
+    (r'^课程介绍_\d{8}$', ('课程介绍_', '', [])),
+    (r'^(一年级|二年级)资料$', ('', '资料', [])),
+    (r'^abc.*xyz$', ('abc', 'xyz', [])),
+    (r'^x?y$', ('', 'y', [])),
+])
+def test_required_literals(source, expected):
+    assert analyze_required_literals(source) == expected
+
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_prefilter_agrees_with_plain_regex(list_checker, pattern):
+    compiled = list_checker.get_compiled_pattern(pattern)
+    expected = []
+    for name in NAMES:
+        matched = bool(compiled.regex.match(name))
+        expected.append((matched, list_checker.extract_list_values(name, pattern) if matched else {}))
+    assert [compiled.match(name) for name in NAMES] == expected
+    assert [list_checker.check_name_pattern(name, pattern) for name in NAMES] == expected
+    passed, extracted = list_checker.check_names_batch(NAMES, pattern)
+    assert [(bool(flag), extracted.get(index, {})) for index, flag in enumerate(passed)] == expected
+
+
+def test_literals_are_required_by_every_match(list_checker):
+    for pattern, name in itertools.product(PATTERNS, NAMES):
+        compiled = list_checker.get_compiled_pattern(pattern)
+        if compiled.regex.match(name):
+            assert name.startswith(compiled.prefix)
+            assert name.rstrip('\n').endswith(compiled.suffix)
+            assert all(substring in name for substring in compiled.substrings)
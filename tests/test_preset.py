@@ -0,0 +1,32 @@
+import pytest
+
+from FileChecker import parse_preset
+
+
+def constraint(**rule):
+    return {'constraint_rules': [rule]}
+
+
+@pytest.mark.parametrize('rule', [
+    {'type': 'coverage', 'key': '年级', 'level': 1},
+    {'type': 'size', 'level': 0, 'max_size': 10},
+    {'type': 'duplicate', 'target': 'folder', 'level': None, 'min_size': 1},
+    {'type': 'unique', 'target': 'file', 'level': True},
+    {'type': 'unique', 'target': 'file', 'level': '1'},
+    {'type': 'size', 'target': 'file', 'level': None, 'min_size': '1KB'},
+    {'type': 'size', 'target': 'file', 'level': None, 'max_size': -1},
+    {'type': 'coverage', 'target': 'folder', 'key': '', 'level': 1},
+])
+def test_invalid_constraint_rules_are_rejected(rule):
+    with pytest.raises(ValueError):
+        parse_preset(constraint(**rule))
+
+
+@pytest.mark.parametrize('rule', [
+    {'type': 'unique', 'target': 'folder', 'level': None, 'key': '', 'scope_level': 1},
+    {'type': 'coverage', 'target': 'file', 'key': '年级', 'level': 2},
+    {'type': 'size', 'target': 'file', 'level': 0, 'min_size': None, 'max_size': 1024},
+    {'type': 'duplicate', 'target': 'file', 'level': None, 'min_size': 0},
+])
+def test_valid_constraint_rules_are_accepted(rule):
+    assert parse_preset(constraint(**rule))[3] == [rule]
@@ -0,0 +1,34 @@
+import pytest
+
+from FileChecker import RuleMatcher
+
+NAMES = ['一年级资料', '一年级语文', '语文资料', '一年级一年级', 'abab', 'abcd', '2024_一年级', '其他', '']
+
+
+def sequential(compiled_patterns, name):
+    """逐条匹配，返回第一条符合的规则序号和列表值"""
+    for position, compiled in enumerate(compiled_patterns):
+        if compiled is not None:
+            is_match, list_values = compiled.match(name)
+            if is_match:
+                return position, list_values
+    return -1, {}
+
+
+@pytest.mark.parametrize('patterns, combined', [
+    (('[年级]资料', '[年级][学科]', '[学科]资料', r'\d{4}_[年级]'), True),
+    (('.*资料', '[年级]资料', '[年级].*'), True),
+    (('[年级][年级]', r'(ab)\1', '.*'), False),
+    (('[年级资料', '[年级].*'), False),
+])
+def test_first_matching_rule_wins(checker, patterns, combined):
+    checker.custom_lists = {'年级': ['一年级', '二年级'], '学科': ['语文', '数学']}
+    compiled_patterns = [checker.get_compiled_pattern(pattern) for pattern in patterns]
+    matcher = RuleMatcher(compiled_patterns)
+    assert (matcher.regex is not None) == combined
+    expected = [sequential(compiled_patterns, name) for name in NAMES]
+    assert [matcher.classify(name) for name in NAMES] == expected
+    positions, extracted = matcher.classify_many(NAMES)
+    assert [(position, extracted.get(index, {})) for index, position in enumerate(positions)] == expected
+    positions, extracted = checker.classify_names_batch(NAMES, patterns)
+    assert [(position, extracted.get(index, {})) for index, position in enumerate(positions)] == expected
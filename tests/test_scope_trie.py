@@ -0,0 +1,43 @@
+import fnmatch
+import itertools
+from pathlib import Path
+
+from FileChecker import ScopeTrie, scope_segments
+
+SCOPES = ['**', '数学', '数学/*', '*/一年级*', '**/备份', '数学/**/练习', '[语数]*/**', '英语/二年级/作业', '**/**/作业', '?文']
+PATHS = [[], ['数学'], ['语文'], ['数学', '一年级'], ['英语', '二年级', '作业'], ['数学', '一年级', '练习'],
+         ['数学', '练习'], ['语文', '备份'], ['语文', '一年级', '备份'], ['英语', '一年级上'], ['数学', 'a', 'b', '练习', '作业']]
+
+
+def scope_matches(segments, path):
+    """逐段比较作用范围与路径，'**' 匹配零个或多个路径段"""
+    if not segments:
+        return not path
+    if segments[0] == '**':
+        return any(scope_matches(segments[1:], path[skip:]) for skip in range(len(path) + 1))
+    return bool(path) and fnmatch.fnmatchcase(path[0], segments[0]) and scope_matches(segments[1:], path[1:])
+
+
+def test_lookup_agrees_with_matching_each_scope():
+    trie = ScopeTrie()
+    for item, scope in enumerate(SCOPES):
+        trie.insert(scope, item)
+    for path in PATHS:
+        expected = [item for item, scope in enumerate(SCOPES) if scope_matches(scope_segments(scope), path)]
+        assert trie.lookup(path) == expected, path
+
+
+def test_duplicate_scopes_share_nodes():
+    trie = ScopeTrie()
+    for item, scope in enumerate(itertools.repeat('数学/*/练习', 3)):
+        trie.insert(scope, item)
+    assert len(trie.children) == 1 and len(trie.children['数学'].wildcards) == 1
+    assert trie.lookup(['数学', '一年级', '练习']) == [0, 1, 2]
+
+
+def test_scoped_rules_apply_only_inside_their_folder(checker, make_tree):
+    root = make_tree({'数学/ab/': '', '语文/ab/': '', '语文/第1课/': ''})
+    checker.folder_rules = {1: [{'pattern': r'第\d+课', 'description': '', 'list_matching': {}, 'scope': '语文'}]}
+    results = checker.run_check(root)
+    assert [result['actual_name'] for result in results] == ['ab']
+    assert Path(results[0]['path']).parent.name == '语文'
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from FileChecker import FileStructureChecker
+
+PRESET = {
+    'custom_lists': {'年级': ['一年级', '二年级', '三年级']},
+    'folder_rules': {
+        '0': [{'pattern': '[年级]', 'description': '年级', 'list_matching': {}}],
+        '1': [{'pattern': r'\d班', 'description': '班级', 'list_matching': {}}],
+    },
+    'file_rules': {
+        '2': [{'pattern': '[年级]_.*', 'extensions': ['.txt'], 'description': '作业', 'list_matching': {'年级': True}}],
+    },
+    'constraint_rules': [
+        {'type': 'unique', 'target': 'file', 'level': None, 'key': '', 'scope_level': None, 'description': ''},
+        {'type': 'coverage', 'target': 'folder', 'key': '年级', 'level': 0, 'description': ''},
+        {'type': 'duplicate', 'target': 'file', 'level': None, 'min_size': 1, 'description': ''},
+    ],
+}
+
+
+@pytest.fixture
+def shard_tree(make_tree):
+    entries = {}
+    for grade in ('一年级', '二年级', '四年级'):
+        for klass in ('1班', '2班', '三班'):
+            entries[f'{grade}/{klass}/{grade}_作业.txt'] = f'{klass}'
+            entries[f'{grade}/{klass}/二年级_作业.doc'] = 'same'
+        entries[f'{grade}/说明.txt'] = grade
+    entries['说明.txt'] = '一年级'
+    return make_tree(entries)
+
+
+def new_checker():
+    checker = FileStructureChecker(gui=False)
+    checker.apply_preset(PRESET)
+    return checker
+
+
+def run_shards(root, shard_count, shard_level):
+    # 部分结果经过 JSON 往返，与写入文件后再读取一致
+    return json.loads(json.dumps([new_checker().run_shard(root, index, shard_count, shard_level) for index in range(shard_count)]))
+
+
+@pytest.mark.parametrize('shard_count, shard_level', [(1, 1), (2, 1), (3, 1), (4, 2), (7, 2)])
+def test_merged_shards_equal_a_full_run(shard_tree, shard_count, shard_level):
+    full = new_checker()
+    full_results = full.run_check(shard_tree)
+    assert {result['type'] for result in full_results} >= {'文件夹命名错误', '文件命名错误', '唯一性冲突', '覆盖缺失', '重复内容'}
+    merged = new_checker()
+    assert merged.merge_shard_results(run_shards(shard_tree, shard_count, shard_level)) == full_results
+    assert merged.format_results() == full.format_results()
+
+
+def test_each_subtree_belongs_to_one_shard(shard_tree):
+    partials = run_shards(shard_tree, 3, 1)
+    problems = [(result['type'], result['path'], result['message']) for partial in partials for result in partial['results']]
+    assert len(problems) == len(set(problems))
+    assert sum(bool(partial['duplicate_candidates'][0][1]) for partial in partials) > 1
+    candidates = [entry[0] for partial in partials for _, sizes in partial['duplicate_candidates']
+                  for _, entries in sizes for entry in entries]
+    assert len(candidates) == len(set(candidates)) == len(set().union(*(partial['content_digests'] for partial in partials)))
+
+
+def test_incomplete_shards_are_rejected(shard_tree):
+    partials = run_shards(shard_tree, 3, 1)
+    with pytest.raises(ValueError):
+        new_checker().merge_shard_results(partials[:2])
+    with pytest.raises(ValueError):
+        new_checker().merge_shard_results(partials + partials[:1])
@@ -0,0 +1,27 @@
+import random
+
+import FileChecker
+from FileChecker import SortedNameQueue
+
+
+def test_sorted_name_queue_spills_and_merges(monkeypatch):
+    monkeypatch.setattr(FileChecker, 'DIRECTORY_CHUNK_SIZE', 7)
+    monkeypatch.setattr(FileChecker, 'NAME_SPILL_FAN_IN', 3)
+    names = [f"{random.randrange(1000)}_文件夹" for _ in range(200)] + ['a\nb', '\udcff名称']
+    queue = SortedNameQueue()
+    for name in names:
+        queue.add(name)
+    assert len(queue) == len(names)
+    assert len(queue.buffer) < 7 and len(queue.runs) < 3
+    assert list(queue) == sorted(names)
+    queue.close()
+
+
+def test_subfolders_are_walked_in_name_order(checker, tmp_path, monkeypatch):
+    monkeypatch.setattr(FileChecker, 'DIRECTORY_CHUNK_SIZE', 3)
+    names = ['b', 'e', 'a', 'd', 'c', 'g', 'f']
+    for name in names:
+        (tmp_path / name).mkdir()
+    checker.folder_rules = {0: [{'pattern': 'x', 'description': '', 'list_matching': {}}]}
+    results = checker.run_check(tmp_path)
+    assert [result['actual_name'] for result in results] == sorted(names)
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+NAMING_RULE = {'pattern': '正确', 'description': '', 'list_matching': {}}
+
+
+@pytest.fixture
+def link_tree(make_tree, tmp_path):
+    root = make_tree({'正确/': '', '.hidden/': '', '__MACOSX/': '', '错误/': ''})
+    outside = make_tree({'外部/': ''}, tmp_path / 'outside')
+    os.symlink(root, root / '正确' / '回到根目录')
+    os.symlink(outside, root / '指向外部')
+    os.symlink(root / '错误', root / '指向内部')
+    return root
+
+
+def folder_problems(checker, root):
+    checker.folder_rules = {0: [NAMING_RULE]}
+    results = checker.run_check(root, rescan=True)
+    return sorted((result['type'], os.path.relpath(result['path'], root)) for result in results)
+
+
+def test_symlinks_are_not_followed(checker, link_tree):
+    checker.symlink_policy = 'none'
+    assert folder_problems(checker, link_tree) == [
+        ('文件夹命名错误', '.hidden'), ('文件夹命名错误', '__MACOSX'), ('文件夹命名错误', '错误')]
+
+
+def test_symlinks_within_root_are_followed(checker, link_tree):
+    checker.symlink_policy = 'within_root'
+    assert folder_problems(checker, link_tree) == [
+        ('文件夹命名错误', '.hidden'), ('文件夹命名错误', '__MACOSX'), ('文件夹命名错误', '指向内部'),
+        ('文件夹命名错误', '错误'), ('符号链接循环', '正确/回到根目录')]
+
+
+def test_symlink_loops_are_reported_once(checker, link_tree):
+    checker.symlink_policy = 'follow'
+    checker.skip_hidden = True
+    assert folder_problems(checker, link_tree) == [
+        ('文件夹命名错误', '指向内部'), ('文件夹命名错误', '指向外部'), ('文件夹命名错误', '错误'),
+        ('符号链接循环', '正确/回到根目录')]